@@ -0,0 +1,44 @@
+from logging.config import fileConfig
+
+from alembic import context
+
+from app.core.database import Base, engine
+from app.core.config import settings
+import app.models.database  # noqa: F401  registers the models on Base.metadata
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+def run_migrations_offline():
+    """Emit the SQL instead of running it: alembic upgrade head --sql"""
+    context.configure(
+        url=settings.DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        render_as_batch=settings.DATABASE_URL.startswith("sqlite")
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online():
+    with engine.connect() as connection:
+        if connection.dialect.name == "postgresql":
+            # index builds on big tables can outlast the app's statement timeout
+            connection.exec_driver_sql("SET statement_timeout = 0")
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            # SQLite can't ALTER most things in place; batch mode rebuilds the table
+            render_as_batch=connection.dialect.name == "sqlite"
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
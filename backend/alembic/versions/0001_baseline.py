@@ -0,0 +1,62 @@
+"""baseline: users, reviews and repositories as created by the old create_all
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('github_id', sa.Integer()),
+        sa.Column('username', sa.String()),
+        sa.Column('email', sa.String(), nullable=True),
+        sa.Column('avatar_url', sa.String(), nullable=True),
+        sa.Column('access_token', sa.Text()),
+        sa.Column('created_at', sa.DateTime())
+    )
+    op.create_index('ix_users_id', 'users', ['id'])
+    op.create_index('ix_users_github_id', 'users', ['github_id'], unique=True)
+    op.create_index('ix_users_username', 'users', ['username'], unique=True)
+
+    op.create_table(
+        'reviews',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=True),
+        sa.Column('repo_name', sa.String()),
+        sa.Column('pr_number', sa.Integer()),
+        sa.Column('pr_url', sa.String()),
+        sa.Column('severity', sa.String()),
+        sa.Column('summary', sa.Text()),
+        sa.Column('issues', sa.JSON()),
+        sa.Column('status', sa.String()),
+        sa.Column('created_at', sa.DateTime())
+    )
+    op.create_index('ix_reviews_id', 'reviews', ['id'])
+    op.create_index('ix_reviews_repo_name', 'reviews', ['repo_name'])
+
+    op.create_table(
+        'repositories',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id')),
+        sa.Column('full_name', sa.String()),
+        sa.Column('github_id', sa.Integer(), unique=True),
+        sa.Column('webhook_id', sa.Integer(), nullable=True),
+        sa.Column('is_active', sa.Integer()),
+        sa.Column('created_at', sa.DateTime())
+    )
+    op.create_index('ix_repositories_id', 'repositories', ['id'])
+    op.create_index('ix_repositories_full_name', 'repositories', ['full_name'])
+
+def downgrade():
+    op.drop_table('repositories')
+    op.drop_table('reviews')
+    op.drop_table('users')
@@ -0,0 +1,93 @@
+"""review pipeline: job queue, review cache, per-file reviews and issues table
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'review_jobs',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('repo_name', sa.String()),
+        sa.Column('pr_number', sa.Integer()),
+        sa.Column('head_sha', sa.String(), nullable=True),
+        sa.Column('pr_data', sa.JSON()),
+        sa.Column('status', sa.String()),
+        sa.Column('coalesced_count', sa.Integer()),
+        sa.Column('attempts', sa.Integer()),
+        sa.Column('max_attempts', sa.Integer()),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('result', sa.JSON(), nullable=True),
+        sa.Column('run_after', sa.DateTime()),
+        sa.Column('created_at', sa.DateTime()),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True)
+    )
+    op.create_index('ix_review_jobs_id', 'review_jobs', ['id'])
+    op.create_index('ix_review_jobs_repo_name', 'review_jobs', ['repo_name'])
+    op.create_index('ix_review_jobs_status', 'review_jobs', ['status'])
+    op.create_index('ix_review_jobs_run_after', 'review_jobs', ['run_after'])
+
+    op.create_table(
+        'review_cache',
+        sa.Column('key', sa.String(), primary_key=True),
+        sa.Column('model', sa.String()),
+        sa.Column('result', sa.JSON()),
+        sa.Column('hits', sa.Integer()),
+        sa.Column('created_at', sa.DateTime()),
+        sa.Column('last_used_at', sa.DateTime())
+    )
+    op.create_index('ix_review_cache_last_used_at', 'review_cache', ['last_used_at'])
+
+    op.create_table(
+        'review_files',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('repo_name', sa.String()),
+        sa.Column('pr_number', sa.Integer()),
+        sa.Column('filename', sa.String()),
+        sa.Column('patch_hash', sa.String()),
+        sa.Column('severity', sa.String()),
+        sa.Column('issues', sa.JSON()),
+        sa.Column('review_id', sa.Integer(), sa.ForeignKey('reviews.id'), nullable=True),
+        sa.Column('updated_at', sa.DateTime()),
+        sa.UniqueConstraint('repo_name', 'pr_number', 'filename')
+    )
+    op.create_index('ix_review_files_id', 'review_files', ['id'])
+    op.create_index('ix_review_files_repo_name', 'review_files', ['repo_name'])
+    op.create_index('ix_review_files_pr_number', 'review_files', ['pr_number'])
+
+    op.create_table(
+        'review_issues',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('review_id', sa.Integer(), sa.ForeignKey('reviews.id')),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=True),
+        sa.Column('repo_name', sa.String()),
+        sa.Column('pr_number', sa.Integer()),
+        sa.Column('type', sa.String()),
+        sa.Column('severity', sa.String()),
+        sa.Column('file', sa.String()),
+        sa.Column('line', sa.Integer(), nullable=True),
+        sa.Column('title', sa.String(), nullable=True),
+        sa.Column('carried_forward', sa.Integer()),
+        sa.Column('created_at', sa.DateTime())
+    )
+    op.create_index('ix_review_issues_id', 'review_issues', ['id'])
+    op.create_index('ix_review_issues_review_id', 'review_issues', ['review_id'])
+    op.create_index('ix_review_issues_created', 'review_issues', ['created_at'])
+    op.create_index('ix_review_issues_repo_created', 'review_issues', ['repo_name', 'created_at'])
+    op.create_index('ix_review_issues_user_created', 'review_issues', ['user_id', 'created_at'])
+    op.create_index('ix_review_issues_type_severity_created', 'review_issues', ['type', 'severity', 'created_at'])
+
+def downgrade():
+    op.drop_table('review_issues')
+    op.drop_table('review_files')
+    op.drop_table('review_cache')
+    op.drop_table('review_jobs')
@@ -0,0 +1,25 @@
+"""revoked_tokens: makes logout invalidate the JWT server-side
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'revoked_tokens',
+        sa.Column('token_id', sa.String(), primary_key=True),
+        sa.Column('expires_at', sa.DateTime()),
+        sa.Column('revoked_at', sa.DateTime())
+    )
+    op.create_index('ix_revoked_tokens_expires_at', 'revoked_tokens', ['expires_at'])
+
+def downgrade():
+    op.drop_table('revoked_tokens')
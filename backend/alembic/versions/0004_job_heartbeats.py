@@ -0,0 +1,23 @@
+"""review_jobs.worker_id and heartbeat_at: requeue only jobs whose worker stopped
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    with op.batch_alter_table('review_jobs') as batch:
+        batch.add_column(sa.Column('worker_id', sa.String(), nullable=True))
+        batch.add_column(sa.Column('heartbeat_at', sa.DateTime(), nullable=True))
+
+def downgrade():
+    with op.batch_alter_table('review_jobs') as batch:
+        batch.drop_column('heartbeat_at')
+        batch.drop_column('worker_id')
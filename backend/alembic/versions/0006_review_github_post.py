@@ -0,0 +1,21 @@
+"""reviews.github_post: what was posted on the PR (mode, id, node_id)
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    with op.batch_alter_table('reviews') as batch:
+        batch.add_column(sa.Column('github_post', sa.JSON(), nullable=True))
+
+def downgrade():
+    with op.batch_alter_table('reviews') as batch:
+        batch.drop_column('github_post')
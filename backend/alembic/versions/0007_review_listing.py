@@ -0,0 +1,27 @@
+"""reviews.issue_count and the keyset-pagination indexes for the review listing
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    with op.batch_alter_table('reviews') as batch:
+        batch.add_column(sa.Column('issue_count', sa.Integer(), nullable=True))
+    op.create_index('ix_reviews_created_id', 'reviews', ['created_at', 'id'])
+    op.create_index('ix_reviews_user_created_id', 'reviews', ['user_id', 'created_at', 'id'])
+    op.create_index('ix_reviews_repo_pr', 'reviews', ['repo_name', 'pr_number'])
+
+def downgrade():
+    op.drop_index('ix_reviews_repo_pr', table_name='reviews')
+    op.drop_index('ix_reviews_user_created_id', table_name='reviews')
+    op.drop_index('ix_reviews_created_id', table_name='reviews')
+    with op.batch_alter_table('reviews') as batch:
+        batch.drop_column('issue_count')
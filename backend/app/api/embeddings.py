@@ -1,39 +1,143 @@
+import base64
+import hashlib
+import tarfile
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import APIRouter, BackgroundTasks
-from github import Github
 from app.core.config import settings
-from app.services.rag_service import embed_repository
+from app.core.executors import run_blocking
+from app.services.rag_service import sync_repository
+from app.services.github_client import PRIORITY_BULK, get_repo, get_sync_http_client, github_call
 
 router = APIRouter()
 
-github_client = Github(settings.GITHUB_TOKEN)
+def list_repo_files(repo_name: str) -> dict:
+    """List every embeddable path with its blob SHA in one recursive Git Trees call."""
+    repo = get_repo(repo_name, PRIORITY_BULK)
+    ref = github_call(repo.get_branch, repo.default_branch, priority=PRIORITY_BULK).commit.sha
+    tree = github_call(repo.get_git_tree, ref, recursive=True, priority=PRIORITY_BULK)
+    if tree.raw_data.get("truncated"):
+        # a partial listing would make the sync delete every indexed file it doesn't show
+        print(f"   Tree for {repo_name} is truncated by GitHub, listing files from the tarball instead")
+        return list_tarball_files(repo, ref)
+    files = {
+        entry.path: entry.sha
+        for entry in tree.tree
+        if entry.type == "blob" and should_embed_file(entry.path)
+    }
+    return {"repo": repo, "ref": ref, "files": files}
+
+def list_tarball_files(repo, ref: str) -> dict:
+    """Full listing for trees too big for the Trees API; blob SHAs are computed the way git does.
+
+    The downloaded archive is kept in the listing so the contents are read from
+    it rather than fetched again; sync_repo closes it.
+    """
+    archive = download_tarball(repo, ref)
+    files = {
+        path: git_blob_sha(data)
+        for path, data in iter_tarball_members(archive)
+        if should_embed_file(path)
+    }
+    return {"repo": repo, "ref": ref, "files": files, "archive": archive}
+
+def git_blob_sha(data: bytes) -> str:
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+def iter_file_contents(listing: dict, paths: list):
+    """Yield the given files with content, one at a time so the repo never sits in memory whole.
+
+    Large syncs download one tarball of the commit instead of one request per
+    file; small ones fetch blobs concurrently. Files that can't be decoded come
+    back with content None so their SHA is still recorded.
+    """
+    if listing.get('archive') or len(paths) >= settings.EMBED_TARBALL_THRESHOLD:
+        yield from iter_tarball_files(listing, paths)
+    else:
+        yield from iter_blob_files(listing, paths)
+
+def iter_blob_files(listing: dict, paths: list):
+    repo = listing['repo']
+    window = settings.GITHUB_BLOB_CONCURRENCY * 4
+    with ThreadPoolExecutor(max_workers=settings.GITHUB_BLOB_CONCURRENCY) as executor:
+        for i in range(0, len(paths), window):
+            batch = paths[i:i + window]
+            contents = executor.map(lambda path: fetch_blob(repo, listing['files'][path]), batch)
+            for path, content in zip(batch, contents):
+                yield make_file(path, listing['files'][path], content)
+
+def fetch_blob(repo, sha: str):
+    try:
+        blob = github_call(repo.get_git_blob, sha, priority=PRIORITY_BULK)
+        return base64.b64decode(blob.content).decode('utf-8')
+    except Exception:
+        return None  # binary/unreadable; embedded as a skip marker
+
+def download_tarball(repo, ref: str):
+    url = github_call(repo.get_archive_link, "tarball", ref, priority=PRIORITY_BULK)
+    archive = tempfile.TemporaryFile()
+    with get_sync_http_client().stream(
+        "GET", url,
+        headers={"Authorization": f"token {settings.GITHUB_TOKEN}"}
+    ) as response:
+        response.raise_for_status()
+        for block in response.iter_bytes(chunk_size=1 << 20):
+            archive.write(block)
+    return archive
+
+def iter_tarball_members(archive):
+    """Yield (path, bytes) for every regular file in the archive."""
+    archive.seek(0)
+    with tarfile.open(fileobj=archive, mode="r:gz") as tar:
+        for member in tar:
+            if not member.isfile() or '/' not in member.name:
+                continue
+            # entries live under a single "<owner>-<repo>-<sha>/" directory
+            yield member.name.split('/', 1)[1], tar.extractfile(member).read()
 
-async def fetch_repo_files(repo_name: str) -> list:
+def iter_tarball_files(listing: dict, paths: list):
+    wanted = set(paths)
+    archive = listing.get('archive')
+    owned = archive is None
+    if owned:
+        archive = download_tarball(listing['repo'], listing['ref'])
     try:
-        repo = github_client.get_repo(repo_name)
-        files = []
-        contents = repo.get_contents("")
-        while contents:
-            file_content = contents.pop(0)
-            
-            if file_content.type == "dir":
-                contents.extend(repo.get_contents(file_content.path))
-            else:
-                if should_embed_file(file_content.path):
-                    try:
-                        content = file_content.decoded_content.decode('utf-8')
-                        files.append({
-                            'path': file_content.path,
-                            'content': content,
-                            'language': detect_language(file_content.path)
-                        })
-                    except:
-                        pass  # Skip binary/unreadable files
-        
-        return files
-    
+        for path, data in iter_tarball_members(archive):
+            if path not in wanted:
+                continue
+            try:
+                content = data.decode('utf-8')
+            except Exception:
+                content = None  # binary/unreadable; embedded as a skip marker
+            yield make_file(path, listing['files'][path], content)
+    finally:
+        if owned:
+            archive.close()
+
+def make_file(path: str, sha: str, content: str) -> dict:
+    return {
+        'path': path,
+        'sha': sha,
+        'content': content,
+        'language': detect_language(path)
+    }
+
+async def sync_repo(repo: str, full: bool = False) -> dict:
+    try:
+        listing = await run_blocking("github_bulk", list_repo_files, repo)
     except Exception as e:
         print(f"Error fetching repo files: {e}")
-        return []
+        return {"status": "error", "message": str(e)}
+    try:
+        return await sync_repository(
+            repo,
+            listing['files'],
+            lambda paths: iter_file_contents(listing, paths),
+            full=full
+        )
+    finally:
+        if listing.get('archive'):
+            listing['archive'].close()
 
 def should_embed_file(path: str) -> bool:
     """Check if file should be embedded"""
@@ -52,7 +156,8 @@ def detect_language(path: str) -> str:
     ext_map = {
         '.py': 'python', '.js': 'javascript', '.jsx': 'javascript',
         '.ts': 'typescript', '.tsx': 'typescript', '.java': 'java',
-        '.go': 'go', '.rs': 'rust', '.cpp': 'cpp', '.c': 'c'
+        '.go': 'go', '.rs': 'rust', '.cpp': 'cpp', '.c': 'c',
+        '.rb': 'ruby', '.php': 'php', '.cs': 'csharp', '.swift': 'swift'
     }
     for ext, lang in ext_map.items():
         if path.endswith(ext):
@@ -60,12 +165,11 @@ def detect_language(path: str) -> str:
     return 'unknown'
 
 @router.post("/embed-repository")
-async def embed_repo(repo: str, background_tasks: BackgroundTasks):
-    """Embed a repository into Qdrant"""
+async def embed_repo(repo: str, background_tasks: BackgroundTasks, full: bool = False):
+    """Embed a repository into the vector store (only files changed since the last run unless full=true)"""
     async def process_embedding():
         print(f"\nStarting repository embedding: {repo}")
-        files = await fetch_repo_files(repo)
-        result = await embed_repository(repo, files)
+        result = await sync_repo(repo, full=full)
         print(f"   Final result: {result}")
     background_tasks.add_task(process_embedding)
     return {
@@ -75,19 +179,22 @@ async def embed_repo(repo: str, background_tasks: BackgroundTasks):
     }
 
 @router.get("/embedding-status")
-async def check_status(repo: str):
+def check_status(repo: str):
     """Check if repository is embedded"""
-    from app.services.rag_service import get_qdrant_client, get_collection_name
-    client = get_qdrant_client()
-    if not client:
-        return {"embedded": False, "reason": "Qdrant not configured"}
+    from app.services.rag_service import get_collection_name
+    from app.services.vector_store import get_vector_store
+    store = get_vector_store()
+    if not store:
+        return {"embedded": False, "reason": "Vector store not configured"}
     collection_name = get_collection_name(repo)
     try:
-        info = client.get_collection(collection_name)
+        if not store.collection_exists(collection_name):
+            return {"embedded": False, "collection": collection_name}
         return {
             "embedded": True,
             "collection": collection_name,
-            "vectors": info.points_count
+            "store": store.name,
+            "vectors": store.count(collection_name)
         }
     except:
         return {"embedded": False, "collection": collection_name}
\ No newline at end of file
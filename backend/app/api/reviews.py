@@ -1,30 +1,219 @@
+import base64
+from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, or_
 from sqlalchemy.orm import Session
-from app.core.database import get_db
-from app.models.database import Review, User
-from app.core.security import verify_token
+from app.core.database import get_db, session_scope
+from app.core.executors import run_blocking
+from app.models.database import Review, ReviewJob, User
+from app.core.auth import get_optional_user_id
+from app.services.job_queue import job_to_dict, get_queue_stats
+from app.services.review_cache import get_cache_stats
+from app.services.github_client import get_github_stats
+from app.services.llm_router import get_llm_stats
+from app.services.review_events import subscribe, format_sse
+from app.services.review_stats import BUCKETS, get_issue_aggregates, get_review_summary
+
+TERMINAL_JOB_STATUSES = {'completed', 'failed', 'superseded'}
 
 router = APIRouter()
 
-def get_current_user_id(token: str = None):
-    if not token:
-        return None
-    payload = verify_token(token)
-    if not payload:
-        return None
-    return int(payload.get("sub"))
+# what the listing returns unless include_issues=true
+LIST_COLUMNS = [
+    Review.id, Review.user_id, Review.repo_name, Review.pr_number, Review.pr_url,
+    Review.severity, Review.summary, Review.issue_count, Review.status, Review.created_at
+]
+
+def encode_cursor(created_at: datetime, review_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{review_id}".encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        created_at, review_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(created_at), int(review_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def list_reviews(
+    db: Session,
+    user_id: int = None,
+    severity: str = None,
+    repo: str = None,
+    since: datetime = None,
+    until: datetime = None,
+    cursor: str = None,
+    limit: int = 50,
+    include_issues: bool = False
+) -> dict:
+    """Newest-first page of reviews, keyset-paginated on (created_at, id).
+
+    Each page is one index range scan no matter how deep it is, unlike OFFSET.
+    """
+    columns = LIST_COLUMNS + [Review.issues] if include_issues else LIST_COLUMNS
+    query = db.query(*columns)
+    if user_id:
+        query = query.filter(Review.user_id == user_id)
+    if severity:
+        query = query.filter(Review.severity == severity)
+    if repo:
+        query = query.filter(Review.repo_name == repo)
+    if since:
+        query = query.filter(Review.created_at >= since)
+    if until:
+        query = query.filter(Review.created_at < until)
+    if cursor:
+        created_at, review_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            Review.created_at < created_at,
+            and_(Review.created_at == created_at, Review.id < review_id)
+        ))
+    limit = max(1, min(limit, 200))
+    rows = query.order_by(Review.created_at.desc(), Review.id.desc()).limit(limit + 1).all()
+    reviews = [dict(row._mapping) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = reviews[-1]
+        next_cursor = encode_cursor(last['created_at'], last['id'])
+    return {"reviews": reviews, "count": len(reviews), "next_cursor": next_cursor}
 
 @router.get("/")
 def get_reviews(
-    token: str = None,
+    user_id: int = Depends(get_optional_user_id),
+    severity: str = None,
+    repo: str = None,
+    since: datetime = None,
+    until: datetime = None,
+    cursor: str = None,
+    limit: int = 50,
+    include_issues: bool = False,
+    db: Session = Depends(get_db)
+):
+    return list_reviews(
+        db,
+        user_id=user_id,
+        severity=severity,
+        repo=repo,
+        since=since,
+        until=until,
+        cursor=cursor,
+        limit=limit,
+        include_issues=include_issues
+    )
+
+@router.get("/stats/summary")
+def review_summary(
+    user_id: int = Depends(get_optional_user_id),
+    repo: str = None,
+    since: datetime = None,
+    until: datetime = None,
+    include_carried: bool = False,
+    db: Session = Depends(get_db)
+):
+    return get_review_summary(db, user_id=user_id, repo=repo, since=since, until=until, include_carried=include_carried)
+
+@router.get("/stats/issues")
+def issue_stats(
+    group_by: str = "type,severity",
+    bucket: str = None,
+    user_id: int = Depends(get_optional_user_id),
+    repo: str = None,
+    type: str = None,
+    severity: str = None,
+    since: datetime = None,
+    until: datetime = None,
+    include_carried: bool = False,
     db: Session = Depends(get_db)
 ):
-    userId = get_current_user_id(token)
-    if userId:
-        reviews = db.query(Review).filter(Review.user_id == userId).order_by(Review.created_at.desc()).limit(50).all()
-    else:
-        reviews = db.query(Review).order_by(Review.created_at.desc()).limit(50).all()
-    return {"reviews": reviews, "count": len(reviews)}
+    """Issue counts, e.g. ?group_by=repo&type=security&severity=high&bucket=month
+
+    Carried-forward findings repeat on every push; include_carried=true counts them anyway.
+    """
+    if bucket and bucket not in BUCKETS:
+        raise HTTPException(status_code=400, detail=f"bucket must be one of {', '.join(BUCKETS)}")
+    return {
+        "group_by": group_by.split(','),
+        "bucket": bucket,
+        "rows": get_issue_aggregates(
+            db,
+            group_by.split(','),
+            bucket=bucket,
+            user_id=user_id,
+            repo=repo,
+            issue_type=type,
+            severity=severity,
+            since=since,
+            until=until,
+            include_carried=include_carried
+        )
+    }
+
+@router.get("/jobs")
+def get_jobs(
+    status: str = None,
+    repo: str = None,
+    limit: int = 50,
+    db: Session = Depends(get_db)
+):
+    query = db.query(ReviewJob)
+    if status:
+        query = query.filter(ReviewJob.status == status)
+    if repo:
+        query = query.filter(ReviewJob.repo_name == repo)
+    jobs = query.order_by(ReviewJob.created_at.desc()).limit(min(limit, 200)).all()
+    return {"jobs": [job_to_dict(job) for job in jobs], "stats": get_queue_stats()}
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: int, db: Session = Depends(get_db)):
+    job = db.query(ReviewJob).filter(ReviewJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_to_dict(job)
+
+def load_job(job_id: int):
+    with session_scope() as db:
+        job = db.query(ReviewJob).filter(ReviewJob.id == job_id).first()
+        return job_to_dict(job) if job else None
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(job_id: int):
+    """Server-sent events for a review job: stage changes, each issue as the model emits it, then the saved review."""
+    job = await run_blocking("db", load_job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def stream():
+        yield format_sse({"event": "job", "data": job})
+        if job['status'] in TERMINAL_JOB_STATUSES:
+            return
+        async for message in subscribe(job_id):
+            if message is not None:
+                yield format_sse(message)
+                continue
+            # quiet for a while: stop if the job ended without us seeing it (e.g. superseded while queued)
+            current = await run_blocking("db", load_job, job_id)
+            if not current or current['status'] in TERMINAL_JOB_STATUSES:
+                yield format_sse({"event": "job", "data": current or {}})
+                return
+            yield ": keepalive\n\n"
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/cache/stats")
+def cache_stats():
+    return get_cache_stats()
+
+@router.get("/llm/stats")
+def llm_stats():
+    return get_llm_stats()
+
+@router.get("/github/stats")
+def github_stats():
+    return get_github_stats()
 
 @router.get("/{review_id}")
 def get_review(review_id: int, db: Session = Depends(get_db)):
@@ -1,40 +1,43 @@
-from fastapi import APIRouter, BackgroundTasks, Depends
+from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
-from app.services.code_analyzer import analyze_pr
+from app.core.executors import run_blocking
+from app.services.job_queue import enqueue_review
 from app.core.database import get_db
-from app.core.security import verify_token
+from app.core.auth import get_optional_user_id
+from app.services.github_client import get_pull
 
 router = APIRouter()
 
-def get_current_user_id(token: str = None):
-    if not token:
-        return None
-    payload = verify_token(token)
-    if not payload:
-        return None
-    return int(payload.get("sub"))
+def resolve_pr_shas(repo: str, pr_number: int) -> tuple:
+    """(base, head) SHAs of the PR so the queue can coalesce by commit; (None, None) leaves it to the worker."""
+    try:
+        pr = get_pull(repo, pr_number)
+        return pr.base.sha, pr.head.sha
+    except Exception as e:
+        print(f"Could not resolve head of {repo}#{pr_number}, resolving at run time: {e}")
+        return None, None
 
 @router.post("/manual-review")
 async def manual_review(
     repo: str,
     pr_number: int,
-    token: str = None,
-    background_tasks: BackgroundTasks = None
+    user_id: int = Depends(get_optional_user_id)
 ):
-    user_id = get_current_user_id(token)
+    base_sha, head_sha = await run_blocking("github", resolve_pr_shas, repo, pr_number)
     pr_data = {
         "repo": repo,
         "pr_number": pr_number,
         "pr_url": f"https://github.com/{repo}/pull/{pr_number}",
-        "base_sha": "main",
-        "head_sha": "branch",
+        "base_sha": base_sha,
+        "head_sha": head_sha,
         "user_id": user_id
     }
-    background_tasks.add_task(analyze_pr, pr_data)
+    job = await run_blocking("db", enqueue_review, pr_data)
     return {
         "status": "processing",
         "message": f"Analyzing {repo}#{pr_number}",
-        "pr_url": pr_data['pr_url']
+        "pr_url": pr_data['pr_url'],
+        "job_id": job["id"]
     }
 
 @router.get("/health")
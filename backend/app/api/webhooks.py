@@ -1,28 +1,74 @@
-from fastapi import APIRouter, Request, BackgroundTasks
-from app.services.code_analyzer import analyze_pr
+from fastapi import APIRouter, Request, BackgroundTasks, HTTPException
+from fastapi.responses import JSONResponse
+from app.core.executors import run_blocking
+from app.services.job_queue import enqueue_review
+from app.services.rag_service import is_repository_embedded
+from app.services.webhook_ingest import (
+    extract_event, forget_delivery, get_webhook_stats, is_duplicate_delivery, verify_signature, webhook_stats
+)
+from app.api.embeddings import sync_repo
 
 router = APIRouter()
 
 @router.post("/github")
 async def github_webhook(request: Request, background_tasks: BackgroundTasks):
-    payload = await request.json()
-    if "pull_request" not in payload:
-        return {"status": "ignored", "reason": "not a PR event"}
-    
-    action = payload.get("action")
-    if action not in ["opened", "synchronize"]:
-        return {"status": "ignored", "reason": f"action '{action}' not tracked"}
-    
-    pr_data = {
-        "repo": payload["repository"]["full_name"],
-        "pr_number": payload["pull_request"]["number"],
-        "pr_url": payload["pull_request"]["html_url"],
-        "base_sha": payload["pull_request"]["base"]["sha"],
-        "head_sha": payload["pull_request"]["head"]["sha"],
-    }
-    background_tasks.add_task(analyze_pr, pr_data)
-    return {"status": "processing", "pr": pr_data["pr_number"]}
+    """Verify, de-duplicate, persist the review job and acknowledge with 202; embedding syncs run after the response."""
+    webhook_stats["received"] += 1
+    body = await request.body()
+    if not verify_signature(body, request.headers.get("X-Hub-Signature-256")):
+        webhook_stats["rejected"] += 1
+        raise HTTPException(status_code=401, detail="Invalid webhook signature")
+
+    delivery_id = request.headers.get("X-GitHub-Delivery")
+    if is_duplicate_delivery(delivery_id):
+        webhook_stats["duplicates"] += 1
+        return {"status": "ignored", "reason": "duplicate delivery"}
+    try:
+        event = extract_event(request.headers.get("X-GitHub-Event"), body)
+    except (ValueError, KeyError, TypeError) as e:
+        forget_delivery(delivery_id)
+        webhook_stats["rejected"] += 1
+        raise HTTPException(status_code=400, detail=f"Malformed webhook payload: {e}")
+    if event["kind"] == "ignored":
+        webhook_stats["ignored"] += 1
+        return {"status": "ignored", "reason": event["reason"]}
+
+    if event["kind"] == "push":
+        webhook_stats["accepted"] += 1
+        background_tasks.add_task(handle_push, event["repo"], delivery_id)
+        return JSONResponse({"status": "accepted", "repo": event["repo"]}, status_code=202)
+
+    # the job row is the durable record of the event, so it must exist before GitHub gets its ack
+    try:
+        job = await run_blocking("db", enqueue_review, event["pr_data"])
+    except Exception as e:
+        webhook_stats["failed"] += 1
+        forget_delivery(delivery_id)
+        print(f"Webhook {delivery_id}: failed to queue review: {e}")
+        raise HTTPException(status_code=503, detail="Could not queue the review, please redeliver")
+    webhook_stats["accepted"] += 1
+    return JSONResponse(
+        {"status": "accepted", "pr": event["pr_data"]["pr_number"], "job_id": job["id"]},
+        status_code=202
+    )
+
+async def handle_push(repo: str, delivery_id: str):
+    """Keep an embedded repo's index fresh when its default branch moves."""
+    try:
+        if not await run_blocking("vector", is_repository_embedded, repo):
+            return
+        print(f"\nSyncing embeddings after push: {repo}")
+        result = await sync_repo(repo)
+        print(f"   Final result: {result}")
+    except Exception as e:
+        webhook_stats["failed"] += 1
+        forget_delivery(delivery_id)
+        print(f"Webhook {delivery_id}: embedding sync for {repo} failed: {e}")
+
+@router.get("/stats")
+def delivery_stats():
+    return get_webhook_stats()
 
 @router.get("/test")
 def test_webhook():
-    return {"message": "Webhook endpoint is working"}
\ No newline at end of file
+    return {"message": "Webhook endpoint is working"}
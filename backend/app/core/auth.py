@@ -0,0 +1,107 @@
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+from app.core.config import settings
+from app.core.database import session_scope
+from app.core.executors import run_blocking
+from app.core.security import token_id, verify_token
+from app.models.database import RevokedToken, User
+
+bearer_scheme = HTTPBearer(auto_error=False)
+
+# token -> {"user": ..., "token_id": ..., "fresh_until": ...}. A hit skips the JWT
+# decode and both DB lookups; entries are rechecked against the DB after
+# AUTH_CACHE_TTL_SECONDS so revocations and user changes made by other workers land.
+token_cache = OrderedDict()
+# token ids revoked by this process -> their exp, so a logout is final here immediately
+revoked_tokens = {}
+
+def user_to_dict(user: User) -> dict:
+    return {
+        "id": user.id,
+        "username": user.username,
+        "email": user.email,
+        "avatar_url": user.avatar_url,
+        "github_id": user.github_id
+    }
+
+def load_identity(tid: str, user_id: int) -> tuple:
+    """(revoked?, user dict or None) in one session."""
+    with session_scope() as db:
+        if db.query(RevokedToken.token_id).filter(RevokedToken.token_id == tid).first():
+            return True, None
+        user = db.query(User).filter(User.id == user_id).first()
+        return False, user_to_dict(user) if user else None
+
+def cached_identity(token: str):
+    entry = token_cache.get(token)
+    if entry is None:
+        return None
+    if entry["fresh_until"] < time.time() or entry["token_id"] in revoked_tokens:
+        del token_cache[token]
+        return None
+    token_cache.move_to_end(token)
+    return entry["user"]
+
+async def resolve_token(token: str) -> dict:
+    user = cached_identity(token)
+    if user:
+        return user
+    payload = verify_token(token)
+    if not payload or not payload.get("sub"):
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+    tid = token_id(token, payload)
+    if tid in revoked_tokens:
+        raise HTTPException(status_code=401, detail="Token has been revoked")
+    revoked, user = await run_blocking("db", load_identity, tid, int(payload["sub"]))
+    if revoked:
+        raise HTTPException(status_code=401, detail="Token has been revoked")
+    if not user:
+        raise HTTPException(status_code=401, detail="User not found")
+    token_cache[token] = {
+        "user": user,
+        "token_id": tid,
+        "fresh_until": min(time.time() + settings.AUTH_CACHE_TTL_SECONDS, payload["exp"])
+    }
+    while len(token_cache) > settings.AUTH_CACHE_SIZE:
+        token_cache.popitem(last=False)
+    return user
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme)) -> dict:
+    """The signed-in user from the `Authorization: Bearer <jwt>` header; 401 without one."""
+    if not credentials:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return await resolve_token(credentials.credentials)
+
+async def get_optional_user_id(credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme)):
+    """The caller's user id, or None for anonymous requests. A bad token is still a 401."""
+    if not credentials:
+        return None
+    return (await resolve_token(credentials.credentials))["id"]
+
+def store_revocation(tid: str, expires_at: datetime):
+    with session_scope() as db:
+        db.query(RevokedToken).filter(RevokedToken.expires_at < datetime.utcnow()).delete(synchronize_session=False)
+        if not db.query(RevokedToken.token_id).filter(RevokedToken.token_id == tid).first():
+            db.add(RevokedToken(token_id=tid, expires_at=expires_at))
+
+async def revoke_token(token: str):
+    payload = verify_token(token)
+    if not payload:
+        return
+    tid = token_id(token, payload)
+    now = time.time()
+    for expired in [key for key, exp in revoked_tokens.items() if exp < now]:
+        del revoked_tokens[expired]
+    revoked_tokens[tid] = payload["exp"]
+    token_cache.pop(token, None)
+    await run_blocking("db", store_revocation, tid, datetime.utcfromtimestamp(payload["exp"]))
+
+def forget_user(user_id: int):
+    """Drop cached identities for a user whose row just changed (e.g. a fresh login)."""
+    for token in [token for token, entry in token_cache.items() if entry["user"]["id"] == user_id]:
+        del token_cache[token]
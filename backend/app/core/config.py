@@ -6,6 +6,14 @@ class Settings(BaseSettings):
     DEBUG: bool = True
     
     DATABASE_URL: str
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: int = 30
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_TIMEOUT_MS: int = 30000
+    DB_IDLE_IN_TRANSACTION_TIMEOUT_MS: int = 60000
+    SQLITE_BUSY_TIMEOUT_SECONDS: int = 30
     
     GITHUB_CLIENT_ID: str
     GITHUB_CLIENT_SECRET: str
@@ -13,13 +21,79 @@ class Settings(BaseSettings):
     
     GROQ_API_KEY: str
     GITHUB_TOKEN: str
+    GITHUB_WEBHOOK_SECRET: Optional[str] = None  # unset skips signature checks; only for local development
+    WEBHOOK_DELIVERY_TTL_SECONDS: int = 24 * 3600  # how long a delivery id is remembered for de-duplication
+    WEBHOOK_DELIVERY_CACHE_SIZE: int = 100000
     
     JWT_SECRET_KEY: str
     JWT_ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  
+    AUTH_CACHE_SIZE: int = 10000
+    AUTH_CACHE_TTL_SECONDS: int = 60  # how long another worker may still accept a token revoked elsewhere
     
     QDRANT_URL: Optional[str] = None
     QDRANT_API_KEY: Optional[str] = None
+    VECTOR_STORE: str = "auto"  # auto|qdrant|local
+    LOCAL_VECTOR_DIR: str = "vector_index"
+    EMBEDDER_WARMUP: bool = False
+    EMBEDDING_BACKEND: str = "torch"  # torch|onnx|onnx-int8
+    EMBEDDING_ONNX_INT8_FILE: str = "onnx/model_quint8_avx2.onnx"
+    EMBED_BATCH_SIZE: int = 64
+    EMBED_UPSERT_BATCH_SIZE: int = 256
+    EMBED_MULTIPROCESS: bool = False
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_PATH: str = "embedding_cache/embeddings.sqlite3"
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 500000
+    EMBED_TARBALL_THRESHOLD: int = 200
+    GITHUB_BLOB_CONCURRENCY: int = 8
+    GITHUB_MAX_REQUESTS_PER_SECOND: float = 10.0
+    GITHUB_BURST: int = 20
+    GITHUB_RATE_LIMIT_RESERVE: int = 500  # calls kept back for reviews when bulk syncs drain the quota
+    GITHUB_OBJECT_CACHE_SIZE: int = 500
+    GITHUB_REPO_FRESH_SECONDS: int = 300
+    RAG_MAX_CONTEXT_MATCHES: int = 10
+    RAG_CONTEXT_TOKEN_BUDGET: int = 1000  # held back from LLM_CHUNK_TOKEN_BUDGET for each chunk's codebase context
+    RAG_COLLECTION_CHECK_SECONDS: int = 300
+    CHUNK_MAX_LINES: int = 60
+    # the embedder reads at most 256 tokens (all-MiniLM-L6-v2); code averages ~3.5 chars/token
+    CHUNK_MAX_CHARS: int = 900
+    CHUNK_MIN_LINES: int = 5
+    CHUNK_OVERLAP_LINES: int = 10
+    
+    GITHUB_THREADS: int = 8
+    GITHUB_BULK_THREADS: int = 2  # embedding syncs; these may sit out a rate-limit window without starving reviews
+    DB_THREADS: int = 8
+    VECTOR_THREADS: int = 4
+    EMBEDDING_THREADS: int = 1
+    EMBEDDING_QUERY_THREADS: int = 1  # review-time query encodes, so they never queue behind bulk batches
+    
+    REVIEW_WORKER_CONCURRENCY: int = 4
+    REVIEW_PER_REPO_CONCURRENCY: int = 1
+    REVIEW_MAX_ATTEMPTS: int = 3
+    REVIEW_RETRY_BACKOFF_SECONDS: int = 30
+    REVIEW_QUEUE_POLL_SECONDS: float = 2.0
+    REVIEW_DEBOUNCE_SECONDS: int = 10
+    REVIEW_HEARTBEAT_SECONDS: int = 15
+    REVIEW_STALE_AFTER_SECONDS: int = 90  # a running job without a heartbeat this long is requeued
+    REVIEW_COMMENT_MODE: str = "review"  # review (inline comments, one PR review) | issue (single summary comment)
+    
+    LLM_CHUNK_TOKEN_BUDGET: int = 6000
+    LLM_MAX_CONCURRENCY: int = 4
+    # "provider:model" lists, primary first; providers are groq, openai (any compatible endpoint) and mock
+    LLM_FAST_MODELS: str = "groq:llama-3.1-8b-instant"
+    LLM_STRONG_MODELS: str = "groq:llama-3.3-70b-versatile"
+    LLM_FAST_MAX_CHANGED_LINES: int = 80
+    LLM_RISKY_PATH_PATTERNS: str = "auth,security,crypto,password,secret,token,payment,billing,permission,migration,.sql"
+    LLM_RISKY_LANGUAGES: str = "c,cpp,php"
+    LLM_HEDGE_AFTER_SECONDS: float = 0  # 0 disables hedged requests
+    LLM_REQUEST_TIMEOUT_SECONDS: int = 120
+    LLM_OPENAI_BASE_URL: Optional[str] = None
+    LLM_OPENAI_API_KEY: Optional[str] = None
+    LLM_MOCK_LATENCY_SECONDS: float = 0.2
+    
+    REVIEW_CACHE_ENABLED: bool = True
+    REVIEW_CACHE_TTL_HOURS: int = 24 * 7
+    REVIEW_CACHE_MAX_ENTRIES: int = 5000
     
     class Config:
         env_file = ".env"
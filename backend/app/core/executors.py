@@ -0,0 +1,37 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from app.core.config import settings
+
+# Blocking SDK work (PyGithub, SQLAlchemy sessions, Qdrant, model inference) runs
+# on these bounded pools so it never stalls the event loop, and so one kind of
+# work (e.g. a big embedding job) can't take every thread from the others.
+executors = {}
+
+def pool_sizes() -> dict:
+    return {
+        "github": settings.GITHUB_THREADS,
+        "github_bulk": settings.GITHUB_BULK_THREADS,
+        "db": settings.DB_THREADS,
+        "vector": settings.VECTOR_THREADS,
+        "embedding": settings.EMBEDDING_THREADS,
+        "embedding_query": settings.EMBEDDING_QUERY_THREADS
+    }
+
+def get_executor(pool: str) -> ThreadPoolExecutor:
+    if pool not in executors:
+        executors[pool] = ThreadPoolExecutor(
+            max_workers=pool_sizes()[pool],
+            thread_name_prefix=f"codeassure-{pool}"
+        )
+    return executors[pool]
+
+async def run_blocking(pool: str, fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(pool), functools.partial(fn, *args, **kwargs))
+
+def shutdown_executors():
+    for executor in executors.values():
+        executor.shutdown(wait=False, cancel_futures=True)
+    executors.clear()
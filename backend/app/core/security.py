@@ -1,3 +1,5 @@
+import hashlib
+import uuid
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
@@ -12,7 +14,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    # jti lets a single token be revoked on logout
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
     return encoded_jwt
 
@@ -21,4 +24,8 @@ def verify_token(token: str):
         payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
         return payload
     except JWTError:
-        return None
\ No newline at end of file
+        return None
+
+def token_id(token: str, payload: dict) -> str:
+    """What a token is revoked by: its jti, or a hash for tokens issued before jti was added."""
+    return payload.get("jti") or hashlib.sha256(token.encode()).hexdigest()
@@ -1,14 +1,31 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.core.database import engine, Base
 from app.api import reviews, webhooks, test_review, auth, embeddings
+from app.core.config import settings
+from app.core.executors import run_blocking, shutdown_executors
+from app.services import job_queue
+from app.services.github_client import close_http_clients
+from app.services.rag_service import stop_encode_pool, warm_up_embedder
 
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    job_queue.start_workers()
+    if settings.EMBEDDER_WARMUP:
+        # load the model in the background; startup and early requests don't wait for it
+        app.state.warmup_task = asyncio.create_task(run_blocking("embedding", warm_up_embedder))
+    yield
+    await job_queue.stop_workers()
+    stop_encode_pool()
+    await close_http_clients()
+    shutdown_executors()
 
 app = FastAPI(
     title="CodeAssure API",
     description="AI-powered code review assistant",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 app.add_middleware(
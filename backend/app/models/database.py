@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, JSON, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, JSON, Text, ForeignKey, UniqueConstraint, Index
 from datetime import datetime
 from app.core.database import Base
 
@@ -22,9 +22,19 @@ class Review(Base):
     severity = Column(String)
     summary = Column(Text)
     issues = Column(JSON)
+    issue_count = Column(Integer, nullable=True)  # so listings don't need to load issues
     status = Column(String, default="completed")
+    timings = Column(JSON, nullable=True)  # seconds per pipeline stage
+    github_post = Column(JSON, nullable=True)  # what was posted on the PR: mode, id, node_id
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        # listing is keyset-paginated on (created_at, id), globally or per user
+        Index('ix_reviews_created_id', 'created_at', 'id'),
+        Index('ix_reviews_user_created_id', 'user_id', 'created_at', 'id'),
+        Index('ix_reviews_repo_pr', 'repo_name', 'pr_number'),
+    )
+
 class Repository(Base):
     __tablename__ = "repositories"
     id = Column(Integer, primary_key=True, index=True)
@@ -33,4 +43,77 @@ class Repository(Base):
     github_id = Column(Integer, unique=True)
     webhook_id = Column(Integer, nullable=True)
     is_active = Column(Integer, default=1)
-    created_at = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ReviewJob(Base):
+    __tablename__ = "review_jobs"
+    id = Column(Integer, primary_key=True, index=True)
+    repo_name = Column(String, index=True)
+    pr_number = Column(Integer)
+    head_sha = Column(String, nullable=True)
+    pr_data = Column(JSON)
+    status = Column(String, default="queued", index=True)  # queued|running|completed|failed|superseded
+    coalesced_count = Column(Integer, default=0)
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=3)
+    last_error = Column(Text, nullable=True)
+    result = Column(JSON, nullable=True)
+    run_after = Column(DateTime, default=datetime.utcnow, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    worker_id = Column(String, nullable=True)  # process running the job
+    heartbeat_at = Column(DateTime, nullable=True)  # refreshed while it runs; stale means the worker died
+
+
+class ReviewCacheEntry(Base):
+    __tablename__ = "review_cache"
+    key = Column(String, primary_key=True)
+    model = Column(String)
+    result = Column(JSON)
+    hits = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+class ReviewFile(Base):
+    __tablename__ = "review_files"
+    __table_args__ = (UniqueConstraint("repo_name", "pr_number", "filename"),)
+    id = Column(Integer, primary_key=True, index=True)
+    repo_name = Column(String, index=True)
+    pr_number = Column(Integer, index=True)
+    filename = Column(String)
+    patch_hash = Column(String)
+    severity = Column(String)
+    issues = Column(JSON)
+    review_id = Column(Integer, ForeignKey("reviews.id"), nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class ReviewIssue(Base):
+    """One row per finding, copied out of Review.issues so analytics can be answered in SQL."""
+    __tablename__ = "review_issues"
+    id = Column(Integer, primary_key=True, index=True)
+    review_id = Column(Integer, ForeignKey("reviews.id"), index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    repo_name = Column(String)
+    pr_number = Column(Integer)
+    type = Column(String)
+    severity = Column(String)  # the issue's own severity if the model gave one, else the review's
+    file = Column(String)
+    line = Column(Integer, nullable=True)
+    title = Column(String, nullable=True)
+    carried_forward = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index('ix_review_issues_created', 'created_at'),
+        Index('ix_review_issues_repo_created', 'repo_name', 'created_at'),
+        Index('ix_review_issues_user_created', 'user_id', 'created_at'),
+        Index('ix_review_issues_type_severity_created', 'type', 'severity', 'created_at'),
+    )
+
+class RevokedToken(Base):
+    """Logged-out tokens, kept until they would have expired anyway."""
+    __tablename__ = "revoked_tokens"
+    token_id = Column(String, primary_key=True)  # the jti claim, or a hash of tokens issued without one
+    expires_at = Column(DateTime, index=True)
+    revoked_at = Column(DateTime, default=datetime.utcnow)
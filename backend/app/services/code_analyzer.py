@@ -1,57 +1,144 @@
-from groq import Groq
-from github import Github
-import json
+import asyncio
+import math
+import time
+from contextlib import contextmanager
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
 from app.models.database import Review
-from app.core.database import SessionLocal
+from app.core.database import session_scope
+from app.core.executors import run_blocking
+from app.services.job_queue import is_job_superseded, record_job_head
+from app.services.github_client import get_pull, github_call
+from app.services.review_poster import post_review_to_github, load_previous_post
+from app.services.llm_router import LLMUnavailableError, complete_review, choose_tier, routing_signature
+from app.services.review_events import publish
+from app.services.response_parser import issue_key
+from app.services.review_stats import issue_rows
+from app.services.review_cache import make_cache_key, get_cached_review, store_review
+from app.services.file_reviews import load_file_reviews, split_changed_files, merge_carried_forward, save_file_reviews, max_severity
 
-groq_client = Groq(api_key=settings.GROQ_API_KEY)
-github_client = Github(settings.GITHUB_TOKEN)
+llm_semaphore = None
+
+PR_FILES_PER_PAGE = 100  # matches the per_page of the shared GitHub client
+
+SYSTEM_PROMPT = """You are a pragmatic code reviewer. Classify issues by severity:
+
+                **HIGH SEVERITY** (Critical - Must fix before merge):
+                - Security vulnerabilities (SQL injection, XSS, authentication bypass)
+                - Critical bugs that crash the application or cause data loss
+                - Memory leaks or severe performance issues
+                - Exposed secrets or credentials in code
+
+                **MEDIUM SEVERITY** (Important - Should fix soon):
+                - Non-critical bugs (edge cases, minor logic errors)
+                - Missing error handling that could cause issues
+                - Performance problems that slow things down but don't break
+                - Deprecated API usage
+                - Missing input validation (non-security critical)
+                - Code duplication that affects maintainability
+
+                **LOW SEVERITY** (Minor or no issues):
+                - Clean code with no functional issues
+                - Minor style inconsistencies
+                - Missing documentation
+                - Code that works correctly but could be improved
+
+                Response format (JSON only):
+                {
+                "severity": "high|medium|low",
+                "summary": "brief explanation",
+                "issues": [
+                    {
+                    "type": "bug|security|performance|style",
+                    "severity": "high|medium|low (this issue on its own)",
+                    "file": "filename",
+                    "line": number,
+                    "title": "issue title",
+                    "description": "what's wrong",
+                    "suggestion": "how to fix"
+                    }
+                ]
+                }
+                If no issues found, return: {"severity": "low", "summary": "Code looks good!", "issues": []}
+                """
 
 async def analyze_pr(pr_data: dict):
     print(f"\nStarting analysis for {pr_data['repo']}#{pr_data['pr_number']}")
+    job_id = pr_data.get('job_id')
+    timings = {}
+    started = time.perf_counter()
     try:
         print("Fetching PR code from GitHub...")
-        code_changes = fetch_pr_code(pr_data)
+        publish(job_id, "stage", {"stage": "fetch"})
+        with stage_timer(timings, 'fetch'):
+            context = await fetch_pr_context(pr_data)
         
-        if not code_changes:
+        if not context['code_changes']:
             print("Warning: No code changes found in this PR")
             return {"status": "no_changes"}
+        code_changes = context['code_changes']
+        if job_id and not pr_data.get('head_sha'):
+            await run_blocking("db", record_job_head, job_id, context['head_sha'])
         
         print(f"Found files:")
         for change in code_changes:
             print(f"   - {change['filename']} ({change['language']})")
         
-        print("Running AI analysis...")
-        review_result = await analyze_with_ai(code_changes, repo_name=pr_data['repo'])
+        with stage_timer(timings, 'load_previous'):
+            previous = await run_blocking("db", load_file_reviews, pr_data['repo'], pr_data['pr_number'])
+        changed, carried = split_changed_files(code_changes, previous)
+        if carried:
+            print(f"   {len(carried)} file(s) unchanged since last review, reusing their findings")
+        
+        publish(job_id, "stage", {"stage": "analysis", "files": len(changed), "carried_forward": len(carried)})
+        for file_review in carried.values():
+            for issue in file_review['issues']:
+                publish(job_id, "issue", {**issue, "carried_forward": True})
+        with stage_timer(timings, 'analysis'):
+            if changed:
+                print("Running AI analysis...")
+                review_result = await analyze_with_ai(
+                    changed,
+                    repo_name=pr_data['repo'],
+                    on_issue=lambda issue: publish(job_id, "issue", issue)
+                )
+            else:
+                print("No file changed since the last review, skipping AI analysis")
+                review_result = {"severity": "low", "summary": "No files changed since the previous review.", "issues": []}
+        review_result = merge_carried_forward(review_result, carried)
+        
+        if await run_blocking("db", is_job_superseded, pr_data.get('job_id')):
+            print("Newer commit queued for this PR, discarding stale review")
+            return {"status": "superseded"}
         
         print("Saving review to database...")
-        db = SessionLocal()
-        review = Review(
-            user_id=pr_data.get('user_id'),
-            repo_name=pr_data['repo'],
-            pr_number=pr_data['pr_number'],
-            pr_url=pr_data['pr_url'],
-            severity=review_result['severity'],
-            summary=review_result['summary'],
-            issues=review_result['issues'],
-            status='completed'
-        )
-        db.add(review)
-        db.commit()
-        db.refresh(review)
-        db.close()
+        publish(job_id, "stage", {"stage": "save"})
+        with stage_timer(timings, 'save'):
+            review_id = await run_blocking("db", save_review, pr_data, review_result, timings)
+            await run_blocking("db", save_file_reviews, pr_data['repo'], pr_data['pr_number'], code_changes, changed, review_result, review_id)
         
         print("Posting review to GitHub...")
-        post_review_to_github(pr_data, review_result)
+        publish(job_id, "stage", {"stage": "post"})
+        with stage_timer(timings, 'post'):
+            previous_post = await run_blocking("db", load_previous_post, pr_data['repo'], pr_data['pr_number'], review_id)
+            github_post = await run_blocking("github", post_review_to_github, context, review_result, previous_post)
+        timings['total'] = round(time.perf_counter() - started, 3)
+        await run_blocking("db", update_review, review_id, timings=timings, github_post=github_post)
         
-        print("Analysis complete")
+        print(f"Analysis complete {timings}")
+        publish(job_id, "review", {
+            "review_id": review_id,
+            "severity": review_result['severity'],
+            "summary": review_result['summary'],
+            "issues": len(review_result['issues']),
+            "timings": timings
+        })
         return {
             "status": "success",
-            "review_id": review.id,
-            "severity": review_result['severity']
+            "review_id": review_id,
+            "severity": review_result['severity'],
+            "timings": timings
         }
     except Exception as e:
         print(f"Error during analysis: {e}")
@@ -59,41 +146,87 @@ async def analyze_pr(pr_data: dict):
         traceback.print_exc() 
         return {"status": "error", "message": str(e)}
 
-def fetch_pr_code(pr_data: dict) -> list:
+@contextmanager
+def stage_timer(timings: dict, stage: str):
+    """Record how long a pipeline stage took, in seconds, under timings[stage]."""
+    started = time.perf_counter()
     try:
-        repo = github_client.get_repo(pr_data['repo'])
-        pr = repo.get_pull(pr_data['pr_number'])
-        
-        code_changes = []
-        files = pr.get_files()
-        
-        for file in files:
-            if should_analyze_file(file.filename):
-                if file.patch:
-                    try:
-                        patch = file.patch
-                        if isinstance(patch, bytes):
-                            patch = patch.decode('utf-8', errors='replace')
-                        
-                        code_changes.append({
-                            'filename': file.filename,
-                            'patch': patch,
-                            'additions': file.additions,
-                            'deletions': file.deletions,
-                            'language': detect_language(file.filename)
-                        })
-                    except Exception as e:
-                        print(f" Skipping {file.filename}: {e}")
-                        continue
-        
-        print(f"   Found {len(code_changes)} files to analyze")
-        return code_changes
-        
-    except Exception as e:
-        print(f"   GitHub API error: {e}")
-        import traceback
-        traceback.print_exc() 
-        return []
+        yield
+    finally:
+        timings[stage] = round(time.perf_counter() - started, 3)
+
+def save_review(pr_data: dict, review_result: dict, timings: dict = None) -> int:
+    with session_scope() as db:
+        review = Review(
+            user_id=pr_data.get('user_id'),
+            repo_name=pr_data['repo'],
+            pr_number=pr_data['pr_number'],
+            pr_url=pr_data['pr_url'],
+            severity=review_result['severity'],
+            summary=review_result['summary'],
+            issues=review_result['issues'],
+            issue_count=len(review_result['issues']),
+            status='completed',
+            timings=dict(timings) if timings else None
+        )
+        db.add(review)
+        db.flush()
+        db.add_all(issue_rows(review))
+        db.commit()
+        db.refresh(review)
+        return review.id
+
+def update_review(review_id: int, **fields):
+    fields = {key: value for key, value in fields.items() if value is not None}
+    if not fields:
+        return
+    with session_scope() as db:
+        db.query(Review).filter(Review.id == review_id).update(fields)
+        db.commit()
+
+async def fetch_pr_context(pr_data: dict) -> dict:
+    """Fetch everything the review needs from GitHub once: PR metadata, head SHA and every changed file.
+
+    The PR's changed_files count tells us how many pages the file listing has,
+    so the pages are requested concurrently on the github pool instead of
+    walked one at a time. GitHub errors propagate so the job is retried.
+    The returned context (including the PR object) is reused when posting.
+    """
+    pr = await run_blocking("github", get_pull, pr_data['repo'], pr_data['pr_number'])
+    files_list = pr.get_files()
+    pages = max(1, math.ceil(pr.changed_files / PR_FILES_PER_PAGE))
+    page_files = await asyncio.gather(
+        *(run_blocking("github", github_call, files_list.get_page, page) for page in range(pages))
+    )
+
+    code_changes = []
+    for file in (file for page in page_files for file in page):
+        if should_analyze_file(file.filename):
+            if file.patch:
+                try:
+                    patch = file.patch
+                    if isinstance(patch, bytes):
+                        patch = patch.decode('utf-8', errors='replace')
+                    
+                    code_changes.append({
+                        'filename': file.filename,
+                        'patch': patch,
+                        'additions': file.additions,
+                        'deletions': file.deletions,
+                        'language': detect_language(file.filename)
+                    })
+                except Exception as e:
+                    print(f" Skipping {file.filename}: {e}")
+                    continue
+    
+    print(f"   Found {len(code_changes)} files to analyze ({pages} page(s) of files)")
+    return {
+        'pr': pr,
+        'head_sha': pr.head.sha,
+        'title': pr.title,
+        'changed_files': pr.changed_files,
+        'code_changes': code_changes
+    }
 
 def should_analyze_file(filename: str) -> bool:
     skip_extensions = [
@@ -114,171 +247,151 @@ def detect_language(filename: str) -> str:
     return 'unknown'
 
 
-async def analyze_with_ai(code_changes: list, repo_name: str = None) -> dict:
-    prompt = build_analysis_prompt(code_changes)
+async def analyze_with_ai(code_changes: list, repo_name: str = None, on_issue=None) -> dict:
+    cache_key = make_cache_key(code_changes, routing_signature(), SYSTEM_PROMPT)
+    cached = await run_blocking("db", get_cached_review, cache_key)
+    if cached:
+        print("   Review cache hit, skipping AI call")
+        if on_issue:
+            for issue in cached['issues']:
+                on_issue(issue)
+        return cached
 
     # add codebase context if we have it
+    context = {}
     if repo_name:
         from app.services.rag_service import get_codebase_context
         context = await get_codebase_context(repo_name, code_changes)
         if context:
-            prompt += f"\n\n## Existing Codebase Patterns:\n{context}"
-            print(f"   Added codebase context ({len(context)} chars)")
+            print(f"   Found codebase context for {len(context)} file(s)")
     
-    try:
-        response = groq_client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[
-                {
-                    "role": "system",
-                    "content": """You are a pragmatic code reviewer. Classify issues by severity:
+    token_budget = settings.LLM_CHUNK_TOKEN_BUDGET
+    if context:
+        token_budget -= settings.RAG_CONTEXT_TOKEN_BUDGET
+    chunks = chunk_code_changes(code_changes, token_budget)
+    print(f"   Split {len(code_changes)} files into {len(chunks)} chunk(s)")
+    prompts = []
+    for chunk in chunks:
+        prompt = build_analysis_prompt(chunk)
+        chunk_context = build_chunk_context(chunk, context, settings.RAG_CONTEXT_TOKEN_BUDGET)
+        if chunk_context:
+            prompt += f"\n\n## Existing Codebase Patterns:\n{chunk_context}"
+        prompts.append((prompt, choose_tier(chunk)))
 
-                **HIGH SEVERITY** (Critical - Must fix before merge):
-                - Security vulnerabilities (SQL injection, XSS, authentication bypass)
-                - Critical bugs that crash the application or cause data loss
-                - Memory leaks or severe performance issues
-                - Exposed secrets or credentials in code
+    outcomes = await asyncio.gather(
+        *(analyze_chunk(prompt, tier, on_issue) for prompt, tier in prompts),
+        return_exceptions=True
+    )
+    failures = [o for o in outcomes if isinstance(o, Exception)]
+    if failures:
+        # a review missing parts would read as clean; fail the job so the queue retries it
+        raise LLMUnavailableError(
+            f"{len(failures)} of {len(chunks)} parts could not be analyzed: {failures[0]}"
+        )
 
-                **MEDIUM SEVERITY** (Important - Should fix soon):
-                - Non-critical bugs (edge cases, minor logic errors)
-                - Missing error handling that could cause issues
-                - Performance problems that slow things down but don't break
-                - Deprecated API usage
-                - Missing input validation (non-security critical)
-                - Code duplication that affects maintainability
+    results = list(outcomes)
+    models = sorted({r.pop('model') for r in results})
+    truncated = any(r.pop('truncated', False) for r in results)
+    result = merge_chunk_results(results)
+    if not truncated and not any(issue.get('type') == 'error' for issue in result['issues']):
+        await run_blocking("db", store_review, cache_key, ",".join(models), result)
+    return result
 
-                **LOW SEVERITY** (Minor or no issues):
-                - Clean code with no functional issues
-                - Minor style inconsistencies
-                - Missing documentation
-                - Code that works correctly but could be improved
+def get_llm_semaphore() -> asyncio.Semaphore:
+    global llm_semaphore
+    if llm_semaphore is None:
+        llm_semaphore = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY)
+    return llm_semaphore
 
-                Response format (JSON only):
-                {
-                "severity": "high|medium|low",
-                "summary": "brief explanation",
-                "issues": [
-                    {
-                    "type": "bug|security|performance|style",
-                    "file": "filename",
-                    "line": number,
-                    "title": "issue title",
-                    "description": "what's wrong",
-                    "suggestion": "how to fix"
-                    }
-                ]
-                }
-                If no issues found, return: {"severity": "low", "summary": "Code looks good!", "issues": []}
-                """
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            temperature=0.1,
-            max_tokens=2000
-        )
-        ai_response = response.choices[0].message.content
-        print(f"   AI response length: {len(ai_response)} chars")
-        result = parse_ai_response(ai_response)
-        return result
-        
-    except Exception as e:
-        print(f"   Groq API error: {e}")
-        return {
-            "severity": "low",
-            "summary": "Analysis failed due to API error",
-            "issues": []
-        }
+async def analyze_chunk(prompt: str, tier: str, on_issue=None) -> dict:
+    """Stream one prompt through the model router, handing each issue to on_issue as soon as it is complete."""
+    return await complete_review(SYSTEM_PROMPT, prompt, tier, on_issue, semaphore=get_llm_semaphore())
 
-def build_analysis_prompt(code_changes: list) -> str:
-    prompt = "Review the following code changes:\n\n"
-    for change in code_changes[:5]:
-        prompt += f"### File: `{change['filename']}` ({change['language']})\n"
-        prompt += f"**Changes:** +{change['additions']} -{change['deletions']}\n\n"
-        prompt += "```diff\n"
-        prompt += change['patch'][:1000]
-        prompt += "\n```\n\n"
-    
-    if len(code_changes) > 5:
-        prompt += f"_(and {len(code_changes) - 5} more files)_\n"
-    return prompt
+def estimate_tokens(text: str) -> int:
+    # ~4 chars per token for code is close enough for budgeting
+    return len(text) // 4 + 1
 
+def split_patch(patch: str, max_chars: int) -> list:
+    """Split a patch into pieces of at most max_chars, preferring hunk boundaries."""
+    if len(patch) <= max_chars:
+        return [patch]
+    pieces, current = [], ""
+    for line in patch.splitlines(keepends=True):
+        starts_hunk = line.startswith('@@')
+        if current and (len(current) + len(line) > max_chars or (starts_hunk and len(current) > max_chars // 2)):
+            pieces.append(current)
+            current = ""
+        while len(line) > max_chars:
+            pieces.append(line[:max_chars])
+            line = line[max_chars:]
+        current += line
+    if current:
+        pieces.append(current)
+    return pieces
 
-def parse_ai_response(ai_response: str) -> dict:
-    try:
-        if '```json' in ai_response:
-            ai_response = ai_response.split('```json')[1].split('```')[0]
-        elif '```' in ai_response:
-            ai_response = ai_response.split('```')[1].split('```')[0]
+def chunk_code_changes(code_changes: list, token_budget: int) -> list:
+    """Greedily pack files into chunks whose prompts fit the token budget.
 
-        ai_response = ai_response.strip()
-        result = json.loads(ai_response)
-        if 'severity' not in result:
-            result['severity'] = 'low'
-        if 'summary' not in result:
-            result['summary'] = 'Code review completed'
-        if 'issues' not in result:
-            result['issues'] = []
-        
-        return result
-        
-    except json.JSONDecodeError as e:
-        print(f"JSON parse error: {e}")
-        print(f"Raw AI response:\n{ai_response[:500]}")
-        return {
-            "severity": "low",
-            "summary": "Analysis completed but response format was invalid",
-            "issues": [{
-                "type": "error",
-                "file": "system",
-                "title": "Parse Error",
-                "description": f"Could not parse AI response: {str(e)}"
-            }]
-        }
+    Files too large for one chunk are split by hunk and spread over several.
+    """
+    max_patch_chars = max(token_budget * 4 - 200, 1000)
+    chunks, current, current_tokens = [], [], 0
+    for change in code_changes:
+        pieces = split_patch(change['patch'], max_patch_chars)
+        for i, piece in enumerate(pieces, 1):
+            part = dict(change, patch=piece)
+            if len(pieces) > 1:
+                part['part'] = f"{i}/{len(pieces)}"
+            tokens = estimate_tokens(piece) + 50
+            if current and current_tokens + tokens > token_budget:
+                chunks.append(current)
+                current, current_tokens = [], 0
+            current.append(part)
+            current_tokens += tokens
+    if current:
+        chunks.append(current)
+    return chunks
 
-def post_review_to_github(pr_data: dict, review: dict):
-    try:
-        repo = github_client.get_repo(pr_data['repo'])
-        pr = repo.get_pull(pr_data['pr_number'])
-        comment = build_comment_markdown(review)
-        pr.create_issue_comment(comment)
-        print("   Successfully posted to GitHub")
-    except Exception as e:
-        print(f"   GitHub comment failed: {e}")
+def build_chunk_context(chunk: list, context: dict, token_budget: int) -> str:
+    """The codebase context for the files in one chunk, whole sections only, within token_budget."""
+    sections, used = [], 0
+    for filename in dict.fromkeys(change['filename'] for change in chunk):
+        section = context.get(filename)
+        if not section:
+            continue
+        tokens = estimate_tokens(section)
+        if used + tokens > token_budget:
+            continue
+        sections.append(section)
+        used += tokens
+    return "\n\n".join(sections)
 
-def build_comment_markdown(review: dict) -> str:
-    severity_labels = {
-        'high': 'HIGH',
-        'medium': 'MEDIUM',
-        'low': 'LOW'
+def merge_chunk_results(results: list) -> dict:
+    if len(results) == 1:
+        return results[0]
+    issues, seen = [], set()
+    for result in results:
+        for issue in result['issues']:
+            key = issue_key(issue)
+            if key in seen:
+                continue
+            seen.add(key)
+            issues.append(issue)
+    return {
+        "severity": max_severity(*(r['severity'] for r in results)),
+        "summary": " ".join(r['summary'] for r in results if r.get('summary')),
+        "issues": issues
     }
-    comment = f"## CodeAssure Review - {severity_labels.get(review['severity'], 'UNKNOWN')}\n\n"
-    comment += f"### Summary\n{review['summary']}\n\n"
-    
-    if review['issues']:
-        comment += f"### Issues Found ({len(review['issues'])})\n\n"
-        
-        for i, issue in enumerate(review['issues'], 1):
-            comment += f"#### {i}. [{issue['type'].upper()}] {issue.get('title', issue['type'].title())}\n\n"
-            comment += f"**File:** `{issue['file']}`"
-            if issue.get('line'):
-                comment += f" (Line {issue['line']})"
-            comment += "\n\n"
-            
-            comment += f"**Issue:** {issue['description']}\n\n"
-            
-            if issue.get('suggestion'):
-                comment += f"**Fix:** {issue['suggestion']}\n\n"
-            
-            if issue.get('code_example'):
-                comment += f"```{issue.get('language', '')}\n{issue['code_example']}\n```\n\n"
-            
-            comment += "---\n\n"
-    else:
-        comment += "### No Issues Found\n\n"
-        comment += "The code looks good! No major issues detected.\n\n"
-    comment += "_Generated by CodeAssure - AI Code Review Assistant_\n"
-    
-    return comment
\ No newline at end of file
+
+def build_analysis_prompt(code_changes: list) -> str:
+    prompt = "Review the following code changes:\n\n"
+    for change in code_changes:
+        prompt += f"### File: `{change['filename']}` ({change['language']})"
+        if change.get('part'):
+            prompt += f" - part {change['part']}"
+        prompt += "\n"
+        prompt += f"**Changes:** +{change['additions']} -{change['deletions']}\n\n"
+        prompt += "```diff\n"
+        prompt += change['patch']
+        prompt += "\n```\n\n"
+    return prompt
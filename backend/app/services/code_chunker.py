@@ -0,0 +1,145 @@
+import ast
+import re
+
+from app.core.config import settings
+
+BRACE_LANGUAGES = {'javascript', 'typescript', 'java', 'go', 'rust', 'cpp', 'c', 'php', 'csharp', 'swift'}
+BLOCK_NAME = re.compile(r'\b(?:function|class|interface|struct|enum|trait|impl|func|fn)\s+(?:\([^)]*\)\s*)?([A-Za-z_$][\w$]*)')
+
+def chunk_code(content: str, language: str) -> list:
+    """Split a source file into function/class sized chunks with 1-based line ranges.
+
+    Python is split on its AST; brace languages on top-level blocks; anything
+    else (or Python that doesn't parse) falls back to overlapping line windows.
+    Chunks stay within CHUNK_MAX_LINES and CHUNK_MAX_CHARS so the embedder sees
+    all of each chunk instead of truncating it.
+    """
+    lines = content.splitlines()
+    if not lines:
+        return []
+    spans = None
+    if language == 'python':
+        spans = python_spans(content, lines)
+    elif language in BRACE_LANGUAGES:
+        spans = brace_spans(lines)
+    if not spans:
+        spans = [(1, len(lines), None)]
+
+    chunks = []
+    for start, end, symbol in merge_small_spans(spans, lines):
+        for window_start, window_end in split_window(start, end, lines):
+            text = "\n".join(lines[window_start - 1:window_end]).strip('\n')
+            if text.strip():
+                chunks.append({
+                    "content": text,
+                    "start_line": window_start,
+                    "end_line": window_end,
+                    "symbol": symbol
+                })
+    return chunks
+
+def span_chars(lines: list, start: int, end: int) -> int:
+    return sum(len(line) + 1 for line in lines[start - 1:end])
+
+def fits(lines: list, start: int, end: int) -> bool:
+    return end - start + 1 <= settings.CHUNK_MAX_LINES and span_chars(lines, start, end) <= settings.CHUNK_MAX_CHARS
+
+def python_spans(content: str, lines: list) -> list:
+    try:
+        tree = ast.parse(content)
+    except (SyntaxError, ValueError):
+        return None
+    spans = []
+    for node in tree.body:
+        start = min([node.lineno] + [d.lineno for d in getattr(node, 'decorator_list', [])])
+        end = node.end_lineno or start
+        if isinstance(node, ast.ClassDef) and not fits(lines, start, end):
+            spans.extend(class_member_spans(node, start, end))
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            spans.append((start, end, node.name))
+        else:
+            spans.append((start, end, None))
+    return fill_gaps(spans, len(lines))
+
+def class_member_spans(node: ast.ClassDef, start: int, end: int) -> list:
+    # large classes: keep the header with the first member, then one span per method
+    spans = []
+    cursor = start
+    for member in node.body:
+        member_start = min([member.lineno] + [d.lineno for d in getattr(member, 'decorator_list', [])])
+        member_end = member.end_lineno or member_start
+        if isinstance(member, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            if member_start > cursor:
+                spans.append((cursor, member_start - 1, node.name))
+            spans.append((member_start, member_end, f"{node.name}.{member.name}"))
+            cursor = member_end + 1
+    if cursor <= end:
+        spans.append((cursor, end, node.name))
+    return spans
+
+def brace_spans(lines: list) -> list:
+    """Cut at points where brace depth returns to zero, i.e. after each top-level block."""
+    spans = []
+    depth = 0
+    start = 1
+    for number, line in enumerate(lines, 1):
+        depth += line.count('{') - line.count('}')
+        depth = max(depth, 0)
+        if depth == 0 and ('}' in line or line.rstrip().endswith(';')):
+            spans.append((start, number, block_name(lines[start - 1:number])))
+            start = number + 1
+    if start <= len(lines):
+        spans.append((start, len(lines), block_name(lines[start - 1:])))
+    return spans
+
+def block_name(block_lines: list):
+    for line in block_lines:
+        match = BLOCK_NAME.search(line)
+        if match:
+            return match.group(1)
+        if '{' in line:
+            return None
+    return None
+
+def fill_gaps(spans: list, line_count: int) -> list:
+    """Attach blank/comment lines between spans to the following span so nothing is dropped."""
+    filled = []
+    cursor = 1
+    for start, end, symbol in spans:
+        filled.append((min(cursor, start), end, symbol))
+        cursor = end + 1
+    if filled and cursor <= line_count:
+        start, _, symbol = filled[-1]
+        filled[-1] = (start, line_count, symbol)
+    return filled
+
+def merge_small_spans(spans: list, lines: list) -> list:
+    """Merge neighbouring spans until they reach a useful size (imports, constants, one-liners)."""
+    merged = []
+    for start, end, symbol in spans:
+        if merged:
+            prev_start, prev_end, prev_symbol = merged[-1]
+            prev_size = prev_end - prev_start + 1
+            size = end - start + 1
+            if (prev_size < settings.CHUNK_MIN_LINES or size < settings.CHUNK_MIN_LINES) \
+                    and fits(lines, prev_start, end):
+                merged[-1] = (prev_start, end, prev_symbol or symbol)
+                continue
+        merged.append((start, end, symbol))
+    return merged
+
+def split_window(start: int, end: int, lines: list) -> list:
+    """Break an oversized span into overlapping windows within the line and character budgets."""
+    if fits(lines, start, end):
+        return [(start, end)]
+    windows = []
+    window_start = start
+    while True:
+        window_end = window_start
+        while window_end < end and fits(lines, window_start, window_end + 1):
+            window_end += 1
+        windows.append((window_start, window_end))
+        if window_end >= end:
+            return windows
+        overlap = min(settings.CHUNK_OVERLAP_LINES, (window_end - window_start + 1) // 4)
+        window_start = window_end - overlap + 1
@@ -0,0 +1,120 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from app.core.config import settings
+
+# per-process counters for the current run of the server
+cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+class EmbeddingCache:
+    """Content-hash -> vector store in a standalone SQLite file.
+
+    Keys hash the model identity together with the exact text, so identical
+    chunks are encoded once no matter which repo, fork or vendored copy they
+    come from. Least recently used rows are evicted above `max_entries`.
+    """
+
+    def __init__(self, path: str, max_entries: int):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used INTEGER NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS ix_embeddings_last_used ON embeddings (last_used)")
+        self.conn.commit()
+
+    def get_many(self, keys: list) -> dict:
+        found = {}
+        now = int(time.time())
+        with self.lock:
+            # stay well under SQLite's bound-parameter limit
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self.conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+                if rows:
+                    self.conn.execute(
+                        f"UPDATE embeddings SET last_used = ? WHERE key IN ({','.join('?' * len(rows))})",
+                        [now] + [key for key, _ in rows]
+                    )
+            self.conn.commit()
+        return found
+
+    def put_many(self, items: dict):
+        if not items:
+            return
+        now = int(time.time())
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [(key, np.asarray(vector, dtype=np.float32).tobytes(), now) for key, vector in items.items()]
+            )
+            count = self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            overflow = count - self.max_entries
+            if overflow > 0:
+                self.conn.execute(
+                    "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (overflow,)
+                )
+                cache_stats["evictions"] += overflow
+            self.conn.commit()
+
+    def count(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+embedding_cache = None
+
+def get_embedding_cache():
+    global embedding_cache
+    if embedding_cache is None and settings.EMBEDDING_CACHE_ENABLED:
+        embedding_cache = EmbeddingCache(settings.EMBEDDING_CACHE_PATH, settings.EMBEDDING_CACHE_MAX_ENTRIES)
+    return embedding_cache
+
+def content_key(model_id: str, text: str) -> str:
+    return hashlib.sha256(f"{model_id}\0{text}".encode()).hexdigest()
+
+def encode_with_cache(texts: list, model_id: str, encode) -> list:
+    """Return vectors for `texts`, calling `encode(missing_texts)` only for cache misses."""
+    cache = get_embedding_cache()
+    if cache is None:
+        return encode(texts)
+    keys = [content_key(model_id, text) for text in texts]
+    found = cache.get_many(list(set(keys)))
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in found:
+            missing.setdefault(key, text)
+    cache_stats["hits"] += len(texts) - sum(1 for key in keys if key not in found)
+    cache_stats["misses"] += len(missing)
+    if missing:
+        vectors = encode(list(missing.values()))
+        new = dict(zip(missing.keys(), vectors))
+        cache.put_many(new)
+        found.update(new)
+    return [found[key] for key in keys]
+
+def get_embedding_cache_stats() -> dict:
+    cache = get_embedding_cache()
+    lookups = cache_stats["hits"] + cache_stats["misses"]
+    return {
+        **cache_stats,
+        "enabled": cache is not None,
+        "entries": cache.count() if cache else 0,
+        "hit_rate": round(cache_stats["hits"] / lookups, 3) if lookups else 0.0
+    }
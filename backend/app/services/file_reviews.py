@@ -0,0 +1,105 @@
+import hashlib
+from datetime import datetime
+
+from app.core.database import session_scope
+from app.models.database import ReviewFile
+from app.services.response_parser import issue_severity
+from app.services.review_cache import normalize_patch
+
+SEVERITY_RANK = {'low': 0, 'medium': 1, 'high': 2}
+
+def hash_patch(patch: str) -> str:
+    return hashlib.sha256(normalize_patch(patch).encode()).hexdigest()
+
+def max_severity(*severities) -> str:
+    known = [s for s in severities if s in SEVERITY_RANK]
+    return max(known, key=SEVERITY_RANK.get) if known else 'low'
+
+def issue_matches_file(issue: dict, filename: str) -> bool:
+    # the model sometimes reports just the basename or a trimmed path
+    reported = (issue.get('file') or '').strip('`./ ')
+    return bool(reported) and (reported == filename or filename.endswith('/' + reported))
+
+def load_file_reviews(repo_name: str, pr_number: int) -> dict:
+    with session_scope() as db:
+        rows = db.query(ReviewFile).filter(
+            ReviewFile.repo_name == repo_name,
+            ReviewFile.pr_number == pr_number
+        ).all()
+        return {
+            row.filename: {
+                "patch_hash": row.patch_hash,
+                "severity": row.severity,
+                "issues": row.issues or []
+            }
+            for row in rows
+        }
+
+def split_changed_files(code_changes: list, previous: dict) -> tuple:
+    """Return (files whose patch changed since the last review, carried-forward file reviews)."""
+    changed, carried = [], {}
+    for change in code_changes:
+        prior = previous.get(change['filename'])
+        if prior and prior['patch_hash'] == hash_patch(change['patch']):
+            carried[change['filename']] = prior
+        else:
+            changed.append(change)
+    return changed, carried
+
+def merge_carried_forward(review_result: dict, carried: dict) -> dict:
+    if not carried:
+        return review_result
+    carried_issues = [
+        {**issue, "carried_forward": True}
+        for file_review in carried.values()
+        for issue in file_review['issues']
+    ]
+    summary = review_result['summary']
+    summary += f"\n\n_Findings for {len(carried)} unchanged file(s) carried forward from the previous review._"
+    return {
+        **review_result,
+        # rated from the carried issues themselves, not the stored file severity of older rows
+        "severity": max_severity(review_result['severity'], *(issue_severity(issue) for issue in carried_issues)),
+        "summary": summary,
+        "issues": review_result['issues'] + carried_issues
+    }
+
+def save_file_reviews(repo_name: str, pr_number: int, code_changes: list, changed: list,
+                      review_result: dict, review_id: int):
+    """Record per-file patch hashes and findings for the files just analyzed.
+
+    Files that dropped out of the PR are forgotten so they get reviewed again if
+    they come back.
+    """
+    changed_names = {change['filename'] for change in changed}
+    current_names = {change['filename'] for change in code_changes}
+    with session_scope() as db:
+        rows = {
+            row.filename: row
+            for row in db.query(ReviewFile).filter(
+                ReviewFile.repo_name == repo_name,
+                ReviewFile.pr_number == pr_number
+            ).all()
+        }
+        for filename, row in rows.items():
+            if filename not in current_names:
+                db.delete(row)
+
+        for change in changed:
+            filename = change['filename']
+            issues = [
+                issue for issue in review_result['issues']
+                if not issue.get('carried_forward') and issue_matches_file(issue, filename)
+            ]
+            severity = max_severity(*(issue_severity(issue) for issue in issues))
+            row = rows.get(filename)
+            if row is None:
+                row = ReviewFile(repo_name=repo_name, pr_number=pr_number, filename=filename)
+                db.add(row)
+            row.patch_hash = hash_patch(change['patch'])
+            row.severity = severity
+            row.issues = issues
+            row.review_id = review_id
+            row.updated_at = datetime.utcnow()
+        db.commit()
+        print(f"   Tracked {len(changed_names)} changed file(s), {len(current_names - changed_names)} carried forward")
@@ -0,0 +1,212 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from app.core.config import settings
+
+# Lower number wins: webhook reviews go ahead of bulk embedding syncs
+PRIORITY_REVIEW = 0
+PRIORITY_BULK = 1
+
+github_client = None
+http_client = None
+sync_http_client = None
+client_lock = threading.Lock()
+
+github_stats = {"calls": 0, "waited_seconds": 0.0, "etag_hits": 0, "etag_misses": 0, "fresh_hits": 0}
+
+def get_github_client():
+    """One PyGithub client for the whole app, so every caller shares its keep-alive connection pool.
+
+    PyGithub's own fixed delay between requests is turned off; pacing is the
+    scheduler's job.
+    """
+    global github_client
+    if github_client is None:
+        with client_lock:
+            if github_client is None:
+                from github import Github
+                github_client = Github(
+                    settings.GITHUB_TOKEN,
+                    pool_size=max(settings.GITHUB_BLOB_CONCURRENCY, settings.GITHUB_THREADS),
+                    per_page=100,
+                    seconds_between_requests=None
+                )
+    return github_client
+
+def get_http_client():
+    """Shared httpx.AsyncClient for plain HTTP calls (OAuth, etc.)."""
+    global http_client
+    if http_client is None:
+        import httpx
+        http_client = httpx.AsyncClient(
+            timeout=30,
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=10)
+        )
+    return http_client
+
+def get_sync_http_client():
+    """Shared blocking httpx.Client for downloads made from worker threads."""
+    global sync_http_client
+    if sync_http_client is None:
+        with client_lock:
+            if sync_http_client is None:
+                import httpx
+                sync_http_client = httpx.Client(follow_redirects=True, timeout=300)
+    return sync_http_client
+
+async def close_http_clients():
+    global http_client, sync_http_client
+    if http_client is not None:
+        await http_client.aclose()
+        http_client = None
+    if sync_http_client is not None:
+        sync_http_client.close()
+        sync_http_client = None
+
+class RateLimitScheduler:
+    """Token bucket in front of the GitHub REST API, refilled from the quota GitHub reports.
+
+    The refill rate spreads whatever `X-RateLimit-Remaining` is left evenly
+    over the time until the window resets (capped at GITHUB_MAX_REQUESTS_PER_SECOND),
+    so a burst of work slows down instead of running dry and failing all at
+    once. Bulk callers also wait while any review call is queued and stop
+    entirely once the quota drops to GITHUB_RATE_LIMIT_RESERVE, which is kept
+    for reviews. Bulk work runs on its own "github_bulk" pool, so a bulk call
+    waiting out the reset never holds a thread reviews need.
+    """
+
+    def __init__(self, max_rate: float, burst: int, reserve: int):
+        self.max_rate = max_rate
+        self.rate = max_rate
+        self.burst = burst
+        self.reserve = reserve
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.remaining = None
+        self.reset_at = 0
+        self.waiting = {PRIORITY_REVIEW: 0, PRIORITY_BULK: 0}
+        self.cond = threading.Condition()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, priority: int) -> float:
+        if priority > PRIORITY_REVIEW and self.waiting[PRIORITY_REVIEW]:
+            return 0.1
+        if self.remaining is not None and time.time() < self.reset_at:
+            floor = self.reserve if priority > PRIORITY_REVIEW else 0
+            if self.remaining <= floor:
+                return self.reset_at - time.time()
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def acquire(self, priority: int = PRIORITY_REVIEW):
+        started = time.monotonic()
+        with self.cond:
+            self.waiting[priority] += 1
+            try:
+                while True:
+                    self.refill()
+                    wait = self.wait_time(priority)
+                    if wait <= 0:
+                        break
+                    self.cond.wait(timeout=min(wait, 5))
+            finally:
+                self.waiting[priority] -= 1
+            self.tokens -= 1
+            if self.remaining is not None:
+                self.remaining -= 1
+            github_stats["calls"] += 1
+            github_stats["waited_seconds"] += time.monotonic() - started
+            self.cond.notify_all()
+
+    def observe(self, remaining: int, limit: int, reset_at: int):
+        """Resync with the rate-limit headers of the latest response."""
+        if limit <= 0:
+            return
+        with self.cond:
+            self.remaining = remaining
+            self.reset_at = reset_at
+            seconds_left = max(reset_at - time.time(), 1)
+            self.rate = min(self.max_rate, max(remaining / seconds_left, 0.05))
+            self.cond.notify_all()
+
+    def snapshot(self) -> dict:
+        with self.cond:
+            return {
+                "remaining": self.remaining,
+                "reset_at": self.reset_at,
+                "rate_per_second": round(self.rate, 2),
+                "waiting_review": self.waiting[PRIORITY_REVIEW],
+                "waiting_bulk": self.waiting[PRIORITY_BULK]
+            }
+
+scheduler = RateLimitScheduler(
+    settings.GITHUB_MAX_REQUESTS_PER_SECOND,
+    settings.GITHUB_BURST,
+    settings.GITHUB_RATE_LIMIT_RESERVE
+)
+
+def github_call(fn, *args, priority: int = PRIORITY_REVIEW, **kwargs):
+    """Run one GitHub API call through the scheduler (blocking; call from a worker thread)."""
+    scheduler.acquire(priority)
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        requester = get_github_client().requester
+        remaining, limit = requester.rate_limiting
+        scheduler.observe(remaining, limit, requester.rate_limiting_resettime)
+
+# Conditional-request cache: repeated lookups revalidate with If-None-Match,
+# and GitHub doesn't count 304 responses against the rate limit
+object_cache = OrderedDict()
+object_cache_lock = threading.Lock()
+
+def cached_object(key: tuple, fetch, fresh_seconds: float, priority: int):
+    with object_cache_lock:
+        entry = object_cache.get(key)
+        if entry:
+            object_cache.move_to_end(key)
+    if entry:
+        obj, fetched_at = entry
+        if time.monotonic() - fetched_at < fresh_seconds:
+            github_stats["fresh_hits"] += 1
+            return obj
+        # other threads may be reading the cached object; revalidate a copy and swap it in
+        obj = copy.copy(obj)
+        changed = github_call(obj.update, priority=priority)
+        github_stats["etag_misses" if changed else "etag_hits"] += 1
+    else:
+        obj = github_call(fetch, priority=priority)
+    with object_cache_lock:
+        object_cache[key] = (obj, time.monotonic())
+        object_cache.move_to_end(key)
+        while len(object_cache) > settings.GITHUB_OBJECT_CACHE_SIZE:
+            object_cache.popitem(last=False)
+    return obj
+
+def get_repo(repo_name: str, priority: int = PRIORITY_REVIEW):
+    return cached_object(
+        ("repo", repo_name),
+        lambda: get_github_client().get_repo(repo_name),
+        settings.GITHUB_REPO_FRESH_SECONDS,
+        priority
+    )
+
+def get_pull(repo_name: str, pr_number: int, priority: int = PRIORITY_REVIEW):
+    # pulls always revalidate: a new push changes head sha and files
+    repo = get_repo(repo_name, priority)
+    return cached_object(
+        ("pull", repo_name, pr_number),
+        lambda: repo.get_pull(pr_number),
+        0,
+        priority
+    )
+
+def get_github_stats() -> dict:
+    return {**github_stats, "waited_seconds": round(github_stats["waited_seconds"], 2), **scheduler.snapshot()}
@@ -0,0 +1,381 @@
+import asyncio
+import os
+import socket
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, or_
+
+from app.core.config import settings
+from app.core.database import session_scope
+from app.core.executors import run_blocking
+from app.services.review_events import publish, close_channel
+from app.models.database import ReviewJob
+
+# job_id -> asyncio.Task for reviews running in this process
+running_tasks = {}
+_wakeup = None
+_dispatcher_task = None
+_loop = None
+# identifies this process on the jobs it claims
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+def enqueue_review(pr_data: dict) -> dict:
+    """Persist a review job and wake the dispatcher. Returns the job as a dict.
+
+    Pushes to the same PR are coalesced: a job still waiting in the queue absorbs
+    the newer head SHA and has its debounce window restarted, and a running job
+    for an older head SHA is marked superseded (and cancelled if it runs here).
+    A request without a head SHA is resolved when it runs, so it never
+    supersedes or joins a running review.
+    """
+    now = datetime.utcnow()
+    run_after = now + timedelta(seconds=settings.REVIEW_DEBOUNCE_SECONDS)
+    head_sha = pr_data.get('head_sha')
+    cancelled = []
+    with session_scope() as db:
+        active = (
+            db.query(ReviewJob)
+            .filter(
+                ReviewJob.repo_name == pr_data['repo'],
+                ReviewJob.pr_number == pr_data['pr_number'],
+                ReviewJob.status.in_(['queued', 'running'])
+            )
+            .order_by(ReviewJob.id.desc())
+            .all()
+        )
+        queued = next((job for job in active if job.status == 'queued'), None)
+        running = [job for job in active if job.status == 'running']
+
+        job = None
+        if queued:
+            if head_sha and queued.head_sha != head_sha:
+                queued.attempts = 0
+                queued.head_sha = head_sha
+            queued.pr_data = merge_pr_data(queued.pr_data, pr_data)
+            queued.run_after = run_after
+            queued.coalesced_count = (queued.coalesced_count or 0) + 1
+            job = queued
+        elif head_sha:
+            same_head = next((r for r in running if r.head_sha == head_sha), None)
+            if same_head:
+                # redelivery or re-request of the commit already being reviewed
+                same_head.coalesced_count = (same_head.coalesced_count or 0) + 1
+                job = same_head
+
+        if head_sha:
+            for stale in running:
+                if stale.head_sha and stale.head_sha != head_sha:
+                    stale.status = 'superseded'
+                    stale.finished_at = now
+                    cancelled.append(stale.id)
+
+        if job is None:
+            job = ReviewJob(
+                repo_name=pr_data['repo'],
+                pr_number=pr_data['pr_number'],
+                head_sha=head_sha,
+                pr_data=pr_data,
+                status='queued',
+                coalesced_count=0,
+                max_attempts=settings.REVIEW_MAX_ATTEMPTS,
+                run_after=run_after
+            )
+            db.add(job)
+        db.commit()
+        db.refresh(job)
+        job_info = job_to_dict(job)
+
+    for job_id in cancelled:
+        call_on_loop(cancel_running_task, job_id)
+        print(f"Superseded running job {job_id} for {pr_data['repo']}#{pr_data['pr_number']}")
+
+    print(f"Queued review job {job_info['id']} for {pr_data['repo']}#{pr_data['pr_number']}")
+    call_on_loop(_wakeup.set if _wakeup else None)
+    return job_info
+
+def merge_pr_data(current: dict, incoming: dict) -> dict:
+    """Newer request wins field by field; fields it doesn't know (e.g. user_id) keep their value."""
+    merged = dict(current or {})
+    merged.update({key: value for key, value in incoming.items() if value is not None})
+    return merged
+
+def call_on_loop(fn, *args):
+    # enqueue_review runs on the db thread pool; asyncio objects must be touched from the loop
+    if fn is None or _loop is None or _loop.is_closed():
+        return
+    _loop.call_soon_threadsafe(fn, *args)
+
+def cancel_running_task(job_id: int):
+    task = running_tasks.get(job_id)
+    if task:
+        task.cancel()
+
+def is_job_superseded(job_id: int) -> bool:
+    if not job_id:
+        return False
+    with session_scope() as db:
+        job = db.query(ReviewJob.status).filter(ReviewJob.id == job_id).first()
+        return bool(job) and job.status == 'superseded'
+
+def record_job_head(job_id: int, head_sha: str):
+    """Fill in the head SHA a job resolved at run time, so later pushes can coalesce with it."""
+    with session_scope() as db:
+        db.query(ReviewJob).filter(ReviewJob.id == job_id, ReviewJob.head_sha.is_(None)).update(
+            {"head_sha": head_sha}, synchronize_session=False
+        )
+
+def job_to_dict(job: ReviewJob) -> dict:
+    return {
+        "id": job.id,
+        "repo": job.repo_name,
+        "pr_number": job.pr_number,
+        "head_sha": job.head_sha,
+        "status": job.status,
+        "coalesced_count": job.coalesced_count,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "last_error": job.last_error,
+        "result": job.result,
+        "run_after": job.run_after,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at
+    }
+
+def get_queue_stats() -> dict:
+    with session_scope() as db:
+        counts = Counter(status for (status,) in db.query(ReviewJob.status).all())
+        coalesced = db.query(func.coalesce(func.sum(ReviewJob.coalesced_count), 0)).scalar()
+    return {
+        "queued": counts.get('queued', 0),
+        "running": counts.get('running', 0),
+        "completed": counts.get('completed', 0),
+        "failed": counts.get('failed', 0),
+        "superseded": counts.get('superseded', 0),
+        "coalesced": int(coalesced),
+        # every coalesced request and every superseded run is a review we did not pay for
+        "runs_saved": int(coalesced) + counts.get('superseded', 0),
+        "running_in_this_worker": len(running_tasks),
+        "concurrency": settings.REVIEW_WORKER_CONCURRENCY,
+        "per_repo_concurrency": settings.REVIEW_PER_REPO_CONCURRENCY
+    }
+
+def claim_jobs(limit: int) -> list:
+    """Mark up to `limit` due jobs as running, respecting the per-repo cap.
+
+    The per-repo cap is counted from the table so it holds across API processes;
+    the global cap is the size of this process's worker pool.
+    """
+    if limit <= 0:
+        return []
+    now = datetime.utcnow()
+    with session_scope() as db:
+        running_per_repo = Counter(
+            repo for (repo,) in db.query(ReviewJob.repo_name).filter(ReviewJob.status == 'running').all()
+        )
+        candidates = (
+            db.query(ReviewJob)
+            .filter(
+                ReviewJob.status == 'queued',
+                ReviewJob.run_after <= now,
+                ReviewJob.attempts < ReviewJob.max_attempts
+            )
+            .order_by(ReviewJob.run_after, ReviewJob.id)
+            .limit(limit * 5)
+            .all()
+        )
+        claimed = []
+        for job in candidates:
+            if len(claimed) >= limit:
+                break
+            if running_per_repo[job.repo_name] >= settings.REVIEW_PER_REPO_CONCURRENCY:
+                continue
+            # conditional update so two processes never claim the same job
+            updated = db.query(ReviewJob).filter(
+                ReviewJob.id == job.id, ReviewJob.status == 'queued'
+            ).update({
+                "status": "running",
+                "attempts": ReviewJob.attempts + 1,
+                "started_at": now,
+                "worker_id": WORKER_ID,
+                "heartbeat_at": now
+            }, synchronize_session=False)
+            if updated:
+                running_per_repo[job.repo_name] += 1
+                claimed.append((job.id, {**job.pr_data, "job_id": job.id}))
+        db.commit()
+        return claimed
+
+def finish_job(job_id: int, result: dict = None, error: str = None):
+    with session_scope() as db:
+        job = db.query(ReviewJob).filter(ReviewJob.id == job_id).first()
+        if not job or job.status == 'superseded':
+            return job.status if job else None
+        if job.worker_id and job.worker_id != WORKER_ID:
+            # requeued as stale and picked up by another worker, which now owns the outcome
+            return job.status
+        retrying = error is not None and job.attempts < job.max_attempts
+        newer = queued_job_for_pr(db, job) if retrying else None
+        if error is None:
+            job.status = 'completed'
+            job.result = result
+            job.last_error = None
+            job.finished_at = datetime.utcnow()
+        elif newer:
+            # a newer request for this PR is already waiting; it reviews the PR, so fold the retry into it
+            # keep fields only the failed request had (e.g. user_id), but not its commit
+            carried = {key: value for key, value in job.pr_data.items() if key not in ('head_sha', 'base_sha')}
+            newer.pr_data = merge_pr_data(carried, newer.pr_data)
+            newer.coalesced_count = (newer.coalesced_count or 0) + 1
+            job.status = 'superseded'
+            job.last_error = error
+            job.finished_at = datetime.utcnow()
+            print(f"   Job {job_id} failed, retry folded into queued job {newer.id}")
+        elif retrying:
+            backoff = settings.REVIEW_RETRY_BACKOFF_SECONDS * (2 ** (job.attempts - 1))
+            job.status = 'queued'
+            job.last_error = error
+            job.run_after = datetime.utcnow() + timedelta(seconds=backoff)
+            print(f"   Job {job_id} failed (attempt {job.attempts}/{job.max_attempts}), retrying in {backoff}s")
+        else:
+            job.status = 'failed'
+            job.last_error = error
+            job.result = result
+            job.finished_at = datetime.utcnow()
+            print(f"   Job {job_id} failed permanently: {error}")
+        db.commit()
+        return job.status
+
+def queued_job_for_pr(db, job: ReviewJob):
+    return (
+        db.query(ReviewJob)
+        .filter(
+            ReviewJob.repo_name == job.repo_name,
+            ReviewJob.pr_number == job.pr_number,
+            ReviewJob.status == 'queued',
+            ReviewJob.id != job.id
+        )
+        .order_by(ReviewJob.id.desc())
+        .first()
+    )
+
+def heartbeat_jobs(job_ids: list):
+    """Mark this worker's running jobs as alive."""
+    if not job_ids:
+        return
+    with session_scope() as db:
+        db.query(ReviewJob).filter(
+            ReviewJob.id.in_(job_ids), ReviewJob.worker_id == WORKER_ID, ReviewJob.status == 'running'
+        ).update({"heartbeat_at": datetime.utcnow()}, synchronize_session=False)
+
+def requeue_interrupted_jobs(worker_id: str = None):
+    """Requeue running jobs whose worker stopped heartbeating, or all of `worker_id`'s jobs.
+
+    Jobs other live processes are running keep fresh heartbeats and are left alone.
+    A stale job that has used up its attempts is failed instead: it may be what
+    killed its worker, and would otherwise be requeued forever. `worker_id`'s
+    own jobs are being handed back on shutdown, so that attempt doesn't count.
+    """
+    now = datetime.utcnow()
+    with session_scope() as db:
+        query = db.query(ReviewJob).filter(ReviewJob.status == 'running')
+        if worker_id:
+            count = query.filter(ReviewJob.worker_id == worker_id).update({
+                "status": "queued",
+                "attempts": ReviewJob.attempts - 1,
+                "run_after": now,
+                "worker_id": None,
+                "heartbeat_at": None
+            }, synchronize_session=False)
+            if count:
+                print(f"Requeued {count} interrupted review jobs")
+            return count
+
+        stale_before = now - timedelta(seconds=settings.REVIEW_STALE_AFTER_SECONDS)
+        stale = query.filter(or_(ReviewJob.heartbeat_at.is_(None), ReviewJob.heartbeat_at < stale_before))
+        failed = stale.filter(ReviewJob.attempts >= ReviewJob.max_attempts).update({
+            "status": "failed",
+            "last_error": "worker stopped during the last attempt",
+            "finished_at": now,
+            "worker_id": None,
+            "heartbeat_at": None
+        }, synchronize_session=False)
+        count = stale.update(
+            {"status": "queued", "run_after": now, "worker_id": None, "heartbeat_at": None},
+            synchronize_session=False
+        )
+        if failed:
+            print(f"Failed {failed} review jobs whose worker died on their last attempt")
+        if count:
+            print(f"Requeued {count} interrupted review jobs")
+        return count
+
+async def run_job(job_id: int, pr_data: dict):
+    from app.services.code_analyzer import analyze_pr
+    result, error = None, None
+    try:
+        result = await analyze_pr(pr_data)
+        if result.get('status') == 'error':
+            error = result.get('message', 'analysis failed')
+    except asyncio.CancelledError:
+        # superseded by a newer commit, or shutting down
+        publish(job_id, "job", {"status": "cancelled"})
+        close_channel(job_id)
+        running_tasks.pop(job_id, None)
+        raise
+    except Exception as e:
+        error = str(e)
+    try:
+        status = await run_blocking("db", finish_job, job_id, result, error)
+        publish(job_id, "job", {"status": status, "error": error})
+        if status != 'queued':
+            close_channel(job_id)
+    finally:
+        running_tasks.pop(job_id, None)
+        _wakeup.set()
+
+async def dispatch_loop():
+    next_heartbeat = 0
+    while True:
+        try:
+            if time.monotonic() >= next_heartbeat:
+                next_heartbeat = time.monotonic() + settings.REVIEW_HEARTBEAT_SECONDS
+                await run_blocking("db", heartbeat_jobs, list(running_tasks))
+                # picks up jobs of workers that died while this one keeps running
+                await run_blocking("db", requeue_interrupted_jobs)
+        except Exception as e:
+            print(f"Job heartbeat error: {e}")
+        try:
+            free = settings.REVIEW_WORKER_CONCURRENCY - len(running_tasks)
+            for job_id, pr_data in await run_blocking("db", claim_jobs, free):
+                running_tasks[job_id] = asyncio.create_task(run_job(job_id, pr_data))
+        except Exception as e:
+            print(f"Job dispatcher error: {e}")
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=settings.REVIEW_QUEUE_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        _wakeup.clear()
+
+def start_workers():
+    global _wakeup, _dispatcher_task, _loop
+    _loop = asyncio.get_running_loop()
+    _wakeup = asyncio.Event()
+    requeue_interrupted_jobs()
+    _dispatcher_task = asyncio.create_task(dispatch_loop())
+    print(f"Review workers started (concurrency={settings.REVIEW_WORKER_CONCURRENCY})")
+
+async def stop_workers():
+    global _dispatcher_task
+    if _dispatcher_task:
+        _dispatcher_task.cancel()
+        _dispatcher_task = None
+    tasks = list(running_tasks.values())
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    # hand our cancelled jobs straight back to the queue instead of waiting for them to go stale
+    await run_blocking("db", requeue_interrupted_jobs, WORKER_ID)
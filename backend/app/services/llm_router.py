@@ -0,0 +1,295 @@
+import asyncio
+import json
+import re
+import time
+from collections import deque
+
+from app.core.config import settings
+from app.services.response_parser import IssueStreamParser, issue_key
+
+MAX_COMPLETION_TOKENS = 2000
+CIRCUIT_ERRORS = 3  # consecutive failures before a model is skipped for a while
+CIRCUIT_OPEN_SECONDS = 30
+
+class LLMUnavailableError(Exception):
+    """Every candidate model failed; the job should be retried rather than a review invented."""
+
+class LostHedgeRace(Exception):
+    pass
+
+class GroqProvider:
+    name = "groq"
+
+    def __init__(self):
+        self.client = None
+
+    def get_client(self):
+        if self.client is None:
+            from groq import AsyncGroq
+            # the router fails over itself; a retry here would only delay that
+            self.client = AsyncGroq(
+                api_key=settings.GROQ_API_KEY,
+                timeout=settings.LLM_REQUEST_TIMEOUT_SECONDS,
+                max_retries=0
+            )
+        return self.client
+
+    async def stream(self, model: str, system: str, prompt: str):
+        stream = await self.get_client().chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": system},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.1,
+            max_tokens=MAX_COMPLETION_TOKENS,
+            stream=True
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+class OpenAICompatibleProvider:
+    """Any /chat/completions endpoint that speaks the OpenAI streaming format (vLLM, Ollama, OpenRouter...)."""
+    name = "openai"
+
+    async def stream(self, model: str, system: str, prompt: str):
+        from app.services.github_client import get_http_client
+        headers = {"Authorization": f"Bearer {settings.LLM_OPENAI_API_KEY}"} if settings.LLM_OPENAI_API_KEY else {}
+        payload = {
+            "model": model,
+            "messages": [
+                {"role": "system", "content": system},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": 0.1,
+            "max_tokens": MAX_COMPLETION_TOKENS,
+            "stream": True
+        }
+        async with get_http_client().stream(
+            "POST", f"{settings.LLM_OPENAI_BASE_URL.rstrip('/')}/chat/completions",
+            headers=headers, json=payload, timeout=settings.LLM_REQUEST_TIMEOUT_SECONDS
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    return
+                choices = json.loads(data).get("choices") or []
+                delta = choices[0].get("delta", {}).get("content") if choices else None
+                if delta:
+                    yield delta
+
+class MockProvider:
+    """Offline stand-in: flags added lines that look like hard-coded secrets, streamed in small pieces."""
+    name = "mock"
+    SECRET = re.compile(r'(password|secret|api_key|token)\s*=\s*["\'][^"\']+["\']', re.IGNORECASE)
+
+    async def stream(self, model: str, system: str, prompt: str):
+        issues = []
+        filename = "unknown"
+        for line in prompt.splitlines():
+            if line.startswith("### File: `"):
+                filename = line.split('`')[1]
+            elif line.startswith('+') and self.SECRET.search(line):
+                issues.append({
+                    "type": "security",
+                    "file": filename,
+                    "title": "Hard-coded credential",
+                    "description": f"`{line[1:].strip()}` looks like a secret committed to source.",
+                    "suggestion": "Load it from the environment or a secret store."
+                })
+        review = {
+            "severity": "high" if issues else "low",
+            "summary": f"Mock review by {model}." if issues else "Code looks good!",
+            "issues": issues
+        }
+        text = json.dumps(review)
+        await asyncio.sleep(settings.LLM_MOCK_LATENCY_SECONDS)
+        for i in range(0, len(text), 40):
+            await asyncio.sleep(0)
+            yield text[i:i + 40]
+
+providers = {
+    "groq": GroqProvider(),
+    "openai": OpenAICompatibleProvider(),
+    "mock": MockProvider()
+}
+
+# per-model counters, kept for the life of the process
+model_stats = {}
+
+def get_model_stats(model: str) -> dict:
+    if model not in model_stats:
+        model_stats[model] = {
+            "calls": 0, "errors": 0, "hedges": 0, "hedge_wins": 0,
+            "consecutive_errors": 0, "open_until": 0.0, "last_error": None,
+            "latencies": deque(maxlen=200), "first_token": deque(maxlen=200)
+        }
+    return model_stats[model]
+
+def percentile(values, fraction: float):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 3)
+
+def get_llm_stats() -> dict:
+    return {
+        model: {
+            "calls": stats["calls"],
+            "errors": stats["errors"],
+            "hedges": stats["hedges"],
+            "hedge_wins": stats["hedge_wins"],
+            "last_error": stats["last_error"],
+            "circuit_open": stats["open_until"] > time.monotonic(),
+            "latency_p50": percentile(stats["latencies"], 0.5),
+            "latency_p95": percentile(stats["latencies"], 0.95),
+            "first_token_p95": percentile(stats["first_token"], 0.95)
+        }
+        for model, stats in model_stats.items()
+    }
+
+def parse_models(spec: str) -> list:
+    return [item.strip() for item in spec.split(',') if item.strip()]
+
+def routing_signature() -> str:
+    """Identifies the model configuration, for cache keys: a tier change must not reuse old reviews."""
+    return f"fast={settings.LLM_FAST_MODELS};strong={settings.LLM_STRONG_MODELS}"
+
+def choose_tier(code_changes: list) -> str:
+    """'strong' for big or risky diffs (by changed lines, path and language), otherwise 'fast'."""
+    changed_lines = sum(change.get('additions', 0) + change.get('deletions', 0) for change in code_changes)
+    if changed_lines > settings.LLM_FAST_MAX_CHANGED_LINES:
+        return "strong"
+    risky_paths = parse_models(settings.LLM_RISKY_PATH_PATTERNS)
+    risky_languages = set(parse_models(settings.LLM_RISKY_LANGUAGES))
+    for change in code_changes:
+        path = change['filename'].lower()
+        if change.get('language') in risky_languages or any(pattern in path for pattern in risky_paths):
+            return "strong"
+    return "fast"
+
+def candidate_models(tier: str) -> list:
+    """The tier's models in order, then the other tier's as a last resort; open circuits go to the back."""
+    fast, strong = parse_models(settings.LLM_FAST_MODELS), parse_models(settings.LLM_STRONG_MODELS)
+    ordered = fast + strong if tier == "fast" else strong + fast
+    seen = []
+    for model in ordered:
+        if model not in seen:
+            seen.append(model)
+    now = time.monotonic()
+    return sorted(seen, key=lambda model: get_model_stats(model)["open_until"] > now)
+
+async def stream_model(model: str, system: str, prompt: str, claim, on_issue=None) -> dict:
+    """Run one attempt. The first attempt to produce a token claims the request; a hedge that loses stops."""
+    provider_name, _, model_name = model.partition(':')
+    provider = providers[provider_name]
+    stats = get_model_stats(model)
+    stats["calls"] += 1
+    parser = IssueStreamParser()
+    started = time.perf_counter()
+    claimed = False
+    try:
+        async for delta in provider.stream(model_name, system, prompt):
+            if not claimed:
+                stats["first_token"].append(time.perf_counter() - started)
+                if not claim(model):
+                    raise LostHedgeRace()
+                claimed = True
+            for issue in parser.feed(delta):
+                if on_issue:
+                    on_issue(issue)
+        result = parser.result()
+        if result.pop('invalid', False):
+            raise ValueError("response was not a JSON review")
+    except (LostHedgeRace, asyncio.CancelledError):
+        raise
+    except Exception as e:
+        stats["errors"] += 1
+        stats["consecutive_errors"] += 1
+        stats["last_error"] = str(e)[:200]
+        if stats["consecutive_errors"] >= CIRCUIT_ERRORS:
+            stats["open_until"] = time.monotonic() + CIRCUIT_OPEN_SECONDS
+        raise
+    stats["consecutive_errors"] = 0
+    stats["latencies"].append(time.perf_counter() - started)
+    print(f"   {model} answered in {time.perf_counter() - started:.1f}s ({len(parser.buffer)} chars)")
+    return result
+
+async def complete_review(system: str, prompt: str, tier: str, on_issue=None, semaphore=None) -> dict:
+    """Get a parsed review for one prompt, failing over across models and hedging slow starts.
+
+    If the running attempt hasn't produced its first token after
+    LLM_HEDGE_AFTER_SECONDS (0 disables hedging), the next candidate is
+    started alongside it and whichever streams first wins. Issues streamed by
+    an attempt that then failed are not handed to on_issue again by the
+    model that takes over. Raises LLMUnavailableError when every candidate fails.
+    """
+    queue = candidate_models(tier)
+    pending = {}
+    errors = []
+    owner = None
+    hedge_model = None
+    published = set()
+
+    def publish_once(issue: dict):
+        key = issue_key(issue)
+        if key not in published:
+            published.add(key)
+            on_issue(issue)
+
+    def claim(model: str) -> bool:
+        nonlocal owner
+        if owner is None:
+            owner = model
+        return owner == model
+
+    async def attempt(model: str) -> dict:
+        handler = publish_once if on_issue else None
+        if semaphore is None:
+            return await stream_model(model, system, prompt, claim, handler)
+        async with semaphore:
+            return await stream_model(model, system, prompt, claim, handler)
+
+    def launch():
+        model = queue.pop(0)
+        pending[asyncio.create_task(attempt(model))] = model
+
+    launch()
+    try:
+        while pending:
+            hedge_after = settings.LLM_HEDGE_AFTER_SECONDS
+            can_hedge = hedge_after > 0 and hedge_model is None and owner is None and queue
+            done, _ = await asyncio.wait(
+                pending, timeout=hedge_after if can_hedge else None, return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                hedge_model = queue[0]
+                print(f"   No tokens from {list(pending.values())} after {hedge_after}s, hedging with {hedge_model}")
+                get_model_stats(hedge_model)["hedges"] += 1
+                launch()
+                continue
+            for task in done:
+                model = pending.pop(task)
+                error = task.exception()
+                if error is None:
+                    if model == hedge_model:
+                        get_model_stats(model)["hedge_wins"] += 1
+                    result = task.result()
+                    result['model'] = model
+                    return result
+                if isinstance(error, LostHedgeRace):
+                    continue
+                print(f"   {model} failed: {error}")
+                errors.append(f"{model}: {error}")
+                if owner == model:
+                    owner = None
+            if not pending and queue:
+                launch()
+    finally:
+        for task in pending:
+            task.cancel()
+    raise LLMUnavailableError("; ".join(errors) or "no LLM models configured")
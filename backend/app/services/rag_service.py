@@ -1,124 +1,347 @@
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
-from sentence_transformers import SentenceTransformer
 from app.core.config import settings
+from app.core.executors import run_blocking
+from app.services.code_chunker import chunk_code
+from app.services.vector_store import EMBEDDING_DIM, get_vector_store
+from app.services.embedding_cache import encode_with_cache, get_embedding_cache_stats
+import asyncio
 import hashlib
+import itertools
+import time
 
-qdrant_client = None
-embedder = None
+EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
 
-def get_qdrant_client():
-    global qdrant_client
-    if qdrant_client is None and settings.QDRANT_URL and settings.QDRANT_API_KEY:
-        qdrant_client = QdrantClient(
-            url=settings.QDRANT_URL,
-            api_key=settings.QDRANT_API_KEY
-        )
-    return qdrant_client
+embedder = None
+encode_pool = None
+# collection -> (exists?, checked_at), so review-time searches skip the existence round trip
+collection_checks = {}
 
 def get_embedder():
     global embedder
     if embedder is None:
-        embedder = SentenceTransformer('all-MiniLM-L6-v2')
+        embedder = load_embedder(settings.EMBEDDING_BACKEND)
     return embedder
 
+def load_embedder(backend: str):
+    """Load MiniLM on the chosen runtime; every backend yields the same 384-dim vectors.
+
+    "torch" is the full-precision PyTorch model, "onnx" runs the exported graph
+    on ONNX Runtime and "onnx-int8" runs its dynamically quantized variant.
+    The ONNX backends need `sentence-transformers[onnx]`.
+    """
+    # torch + sentence_transformers take seconds to import; only pay for it when RAG is used
+    from sentence_transformers import SentenceTransformer
+    if backend == "onnx":
+        return SentenceTransformer(EMBEDDING_MODEL, backend="onnx")
+    if backend == "onnx-int8":
+        return SentenceTransformer(
+            EMBEDDING_MODEL,
+            backend="onnx",
+            model_kwargs={"file_name": settings.EMBEDDING_ONNX_INT8_FILE}
+        )
+    if backend != "torch":
+        raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}' (expected torch, onnx or onnx-int8)")
+    return SentenceTransformer(EMBEDDING_MODEL)
+
+def embedding_model_id() -> str:
+    # quantized vectors differ slightly, so each backend gets its own cache entries
+    return f"{EMBEDDING_MODEL}:{settings.EMBEDDING_BACKEND}"
+
+def warm_up_embedder():
+    """Load the model and run one encode so the first real request doesn't pay for it."""
+    started = time.perf_counter()
+    try:
+        get_embedder().encode(["def warm_up():\n    return None"])
+        print(f"Embedder warmed up in {time.perf_counter() - started:.1f}s")
+    except Exception as e:
+        print(f"Embedder warm-up failed: {e}")
+
+def get_encode_pool():
+    """Multi-process pool spanning all CPU cores, started on first use."""
+    global encode_pool
+    if encode_pool is None:
+        encode_pool = get_embedder().start_multi_process_pool()
+    return encode_pool
+
+def stop_encode_pool():
+    global encode_pool
+    if encode_pool is not None:
+        from sentence_transformers import SentenceTransformer
+        SentenceTransformer.stop_multi_process_pool(encode_pool)
+        encode_pool = None
+
 def get_collection_name(repo_name: str) -> str:
     safe_name = repo_name.replace('/', '_').replace('-', '_')
     return f"repo_{safe_name}"
 
-async def embed_repository(repo_name: str, files: list) -> dict:
-    client = get_qdrant_client()
-    if not client:
-        return {"status": "error", "message": "Qdrant not configured"}
-    embedder = get_embedder()
+async def embed_repository(repo_name: str, files) -> dict:
+    """Embed files into the repo's collection as a stream.
+
+    `files` may be any iterable, including a lazy generator that hits GitHub:
+    the next batch is pulled on the github pool while the current one is being
+    encoded, and points are upserted in bounded batches so memory stays flat
+    regardless of repository size.
+    """
+    store = get_vector_store()
+    if not store:
+        return {"status": "error", "message": "Vector store not configured"}
     collection_name = get_collection_name(repo_name)
     print(f"Embedding repository: {repo_name}")
-    print(f"   Collection: {collection_name}")
-    print(f"   Files: {len(files)}")
+    print(f"   Collection: {collection_name} ({store.name})")
     
     try:
+        await run_blocking("vector", store.ensure_collection, collection_name)
+        collection_checks[collection_name] = (True, time.monotonic())
+        started = time.perf_counter()
+        files_seen, files_embedded = 0, 0
+        pending = []
+        iterator = iter(files)
+        next_batch = asyncio.ensure_future(run_blocking("github_bulk", take_batch, iterator, settings.EMBED_BATCH_SIZE))
         try:
-            client.get_collection(collection_name)
-            print(f"   Collection already exists, updating...")
-        except:
-            print(f"   Creating new collection...")
-            client.create_collection(
-                collection_name=collection_name,
-                vectors_config=VectorParams(
-                    size=384,
-                    distance=Distance.COSINE
-                )
-            )
-        points = []
-        for idx, file in enumerate(files):
-            if not file.get('content') or len(file['content']) > 50000:
-                continue
-            
-            embedding = embedder.encode(file['content']).tolist()       
-            file_hash = hashlib.md5(f"{repo_name}:{file['path']}".encode()).hexdigest()
-            points.append(PointStruct(
-                id=file_hash,
-                vector=embedding,
-                payload={
-                    "repo": repo_name,
-                    "path": file['path'],
-                    "content": file['content'][:10000],
-                    "language": file.get('language', 'unknown'),
-                    "size": len(file['content'])
-                }
-            ))
-            if (idx + 1) % 10 == 0:
-                print(f"   Embedded {idx + 1}/{len(files)} files")
-        if points:
-            client.upsert(collection_name=collection_name, points=points)
-            print(f"   Successfully uploaded {len(points)} embeddings")       
+            while True:
+                batch = await next_batch
+                if not batch:
+                    break
+                next_batch = asyncio.ensure_future(run_blocking("github_bulk", take_batch, iterator, settings.EMBED_BATCH_SIZE))
+                files_seen += len(batch)
+
+                points = await run_blocking("embedding", build_points, repo_name, batch)
+                # every file in the batch is replaced, including ones that only get a skip marker
+                await run_blocking("vector", store.delete_paths, collection_name, {file['path'] for file in batch})
+                pending.extend(points)
+                files_embedded += len({point['payload']['path'] for point in points if not point['payload'].get('skipped')})
+                if len(pending) >= settings.EMBED_UPSERT_BATCH_SIZE:
+                    await run_blocking("vector", store.upsert, collection_name, pending)
+                    pending = []
+
+                elapsed = time.perf_counter() - started
+                print(f"   Embedded {files_embedded}/{files_seen} files ({files_embedded / elapsed:.1f} files/sec)")
+        finally:
+            # the prefetch may still be reading the iterator (and the tarball behind it) on github_bulk
+            if not next_batch.done():
+                await asyncio.wait([next_batch])
+            if not next_batch.cancelled():
+                next_batch.exception()
+            if hasattr(iterator, 'close'):
+                iterator.close()
+        if pending:
+            await run_blocking("vector", store.upsert, collection_name, pending)
+        elapsed = time.perf_counter() - started
+        print(f"   Successfully embedded {files_embedded} files in {elapsed:.1f}s")       
         return {
             "status": "success",
             "collection": collection_name,
-            "files_embedded": len(points)
+            "files_embedded": files_embedded,
+            "seconds": round(elapsed, 2),
+            "files_per_sec": round(files_embedded / elapsed, 1) if elapsed else 0.0,
+            "embedding_cache": get_embedding_cache_stats()
         }       
     except Exception as e:
         print(f"   Embedding error: {e}")
         return {"status": "error", "message": str(e)}
 
-async def find_similar_code(repo_name: str, code_snippet: str, limit: int = 3) -> list:
-    client = get_qdrant_client()
-    if not client:
-        return []
+async def sync_repository(repo_name: str, current_shas: dict, fetch_files, full: bool = False) -> dict:
+    """Bring the repo's collection in line with its current tree.
+
+    `current_shas` maps each embeddable path to its git blob SHA and
+    `fetch_files(paths)` yields file dicts for just those paths. Only files whose
+    SHA differs from the one stored in the payload are fetched and re-embedded,
+    and files that no longer exist are deleted from the collection.
+    """
+    store = get_vector_store()
+    if not store:
+        return {"status": "error", "message": "Vector store not configured"}
+    collection_name = get_collection_name(repo_name)
+    try:
+        indexed = await run_blocking("vector", store.file_shas, collection_name)
+    except Exception as e:
+        print(f"   Could not read indexed files, doing a full embed: {e}")
+        indexed = {}
+    changed = [path for path, sha in current_shas.items() if full or indexed.get(path) != sha]
+    removed = [path for path in indexed if path not in current_shas]
+    print(f"   {len(current_shas)} files in repo: {len(changed)} new/changed, {len(removed)} removed, "
+          f"{len(current_shas) - len(changed)} unchanged")
+    
+    if removed:
+        await run_blocking("vector", store.delete_paths, collection_name, removed)
+    result = {"status": "success", "collection": collection_name, "files_embedded": 0}
+    if changed:
+        result = await embed_repository(repo_name, fetch_files(changed))
+    result.update({
+        "files_unchanged": len(current_shas) - len(changed),
+        "files_removed": len(removed)
+    })
+    return result
+
+def is_repository_embedded(repo_name: str) -> bool:
+    store = get_vector_store()
+    return bool(store) and store.collection_exists(get_collection_name(repo_name))
+
+def collection_known(store, collection_name: str) -> bool:
+    exists, checked_at = collection_checks.get(collection_name, (False, None))
+    if checked_at is None or time.monotonic() - checked_at > settings.RAG_COLLECTION_CHECK_SECONDS:
+        exists = store.collection_exists(collection_name)
+        collection_checks[collection_name] = (exists, time.monotonic())
+    return exists
+
+def take_batch(iterator, size: int) -> list:
+    return list(itertools.islice(iterator, size))
+
+def encode_documents(texts: list) -> list:
+    """Encode repository content, skipping the model for anything already in the embedding cache."""
+    return encode_with_cache(texts, embedding_model_id(), encode_batch)
+
+def encode_batch(texts: list) -> list:
     embedder = get_embedder()
+    if settings.EMBED_MULTIPROCESS and len(texts) > settings.EMBED_BATCH_SIZE // 2:
+        vectors = embedder.encode_multi_process(texts, get_encode_pool(), batch_size=settings.EMBED_BATCH_SIZE)
+    else:
+        vectors = embedder.encode(texts, batch_size=settings.EMBED_BATCH_SIZE)
+    return [vector.tolist() for vector in vectors]
+
+def encode_queries(texts: list) -> list:
+    """Encode review-time queries in-process; the multi-process pool belongs to bulk embedding."""
+    return [vector.tolist() for vector in get_embedder().encode(texts, batch_size=settings.EMBED_BATCH_SIZE)]
+
+def build_points(repo_name: str, files: list) -> list:
+    """Chunk each file into functions/classes and embed every chunk.
+
+    Files that can't be embedded (empty, over 50000 chars, undecodable) get a
+    skip marker instead: a zero-vector point that records their SHA, so the
+    next sync doesn't fetch them again. Searches drop markers.
+    """
+    chunks, points = [], []
+    for file in files:
+        if not file.get('content') or len(file['content']) > 50000:
+            points.append(skip_marker(repo_name, file))
+            continue
+        for chunk in chunk_code(file['content'], file.get('language', 'unknown')):
+            chunks.append((file, chunk))
+    if not chunks:
+        return points
+    # embed the bare chunk (the path lives in the payload) so identical code in
+    # other files, repos and forks hits the same embedding cache entry
+    vectors = encode_documents([chunk['content'] for file, chunk in chunks])
+    for (file, chunk), embedding in zip(chunks, vectors):
+        chunk_hash = hashlib.md5(
+            f"{repo_name}:{file['path']}:{chunk['start_line']}-{chunk['end_line']}".encode()
+        ).hexdigest()
+        points.append({
+            "id": chunk_hash,
+            "vector": embedding,
+            "payload": {
+                "repo": repo_name,
+                "path": file['path'],
+                "content": chunk['content'][:10000],
+                "language": file.get('language', 'unknown'),
+                "start_line": chunk['start_line'],
+                "end_line": chunk['end_line'],
+                "symbol": chunk['symbol'],
+                "sha": file.get('sha'),
+                "size": len(file['content'])
+            }
+        })
+    return points
+
+def skip_marker(repo_name: str, file: dict) -> dict:
+    return {
+        "id": hashlib.md5(f"{repo_name}:{file['path']}:skipped".encode()).hexdigest(),
+        "vector": [0.0] * EMBEDDING_DIM,
+        "payload": {
+            "repo": repo_name,
+            "path": file['path'],
+            "sha": file.get('sha'),
+            "skipped": True
+        }
+    }
+
+async def find_similar_code(repo_name: str, code_snippet: str, limit: int = 3) -> list:
+    results, _ = await find_similar_code_batch(repo_name, [code_snippet], limit=limit)
+    return results[0] if results else []
+
+async def find_similar_code_batch(repo_name: str, code_snippets: list, limit: int = 3) -> tuple:
+    """Search for every snippet with one encode pass and one batch search.
+
+    Returns (matches per snippet, latency breakdown in ms).
+    """
+    store = get_vector_store()
+    if not store or not code_snippets:
+        return [], {}
     collection_name = get_collection_name(repo_name)
+    timings = {}
     try:
-        query_embedding = embedder.encode(code_snippet).tolist()
-        results = client.search(
-            collection_name=collection_name,
-            query_vector=query_embedding,
-            limit=limit,
-            with_payload=True
-        )
+        if not await run_blocking("vector", collection_known, store, collection_name):
+            return [], {}
+        started = time.perf_counter()
+        query_embeddings = await run_blocking("embedding_query", encode_queries, code_snippets)
+        encoded = time.perf_counter()
+        responses = await run_blocking("vector", store.search_batch, collection_name, query_embeddings, limit)
+        searched = time.perf_counter()
+        timings = {
+            "encode_ms": round((encoded - started) * 1000, 1),
+            "search_ms": round((searched - encoded) * 1000, 1),
+            "total_ms": round((searched - started) * 1000, 1),
+            "queries": len(code_snippets)
+        }
         return [
-            {
-                "path": hit.payload['path'],
-                "content": hit.payload['content'],
-                "language": hit.payload['language'],
-                "score": hit.score
-            }
-            for hit in results
-        ]
+            [
+                {
+                    "id": hit['id'],
+                    "path": hit['payload']['path'],
+                    "content": hit['payload']['content'],
+                    "language": hit['payload']['language'],
+                    "start_line": hit['payload'].get('start_line'),
+                    "end_line": hit['payload'].get('end_line'),
+                    "symbol": hit['payload'].get('symbol'),
+                    "score": hit['score']
+                }
+                for hit in hits
+                if not hit['payload'].get('skipped')
+            ]
+            for hits in responses
+        ], timings
     except Exception as e:
         print(f"   Search error: {e}")
-        return []
+        return [], timings
 
-async def get_codebase_context(repo_name: str, code_changes: list) -> str:
+def format_location(match: dict) -> str:
+    location = match['path']
+    if match.get('start_line'):
+        location += f":{match['start_line']}-{match['end_line']}"
+    if match.get('symbol'):
+        location += f" ({match['symbol']})"
+    return location
+
+async def get_codebase_context(repo_name: str, code_changes: list) -> dict:
+    """Similar code from the repo's index, as a prompt section per changed file.
+
+    Returns {filename: section}; callers attach only the sections for the files
+    in each prompt.
+    """
     if not code_changes:
-        return ""
-    context_parts = []
-    for change in code_changes[:3]:
-        similar = await find_similar_code(repo_name, change['patch'][:1000], limit=2)
-        if similar:
-            context_parts.append(f"\n### Similar patterns in {change['filename']}:")
+        return {}
+    results, timings = await find_similar_code_batch(
+        repo_name, [change['patch'][:1000] for change in code_changes], limit=2
+    )
+    if timings:
+        print(f"   RAG retrieval for {timings['queries']} files: encode {timings['encode_ms']}ms, "
+              f"search {timings['search_ms']}ms, total {timings['total_ms']}ms")
+
+    # a chunk that matches several changed files is shown once, under its best match
+    best = {}
+    for change, similar in zip(code_changes, results):
+        for match in similar:
+            if match['id'] not in best or match['score'] > best[match['id']][1]['score']:
+                best[match['id']] = (change['filename'], match)
+    top = sorted(best.values(), key=lambda item: item[1]['score'], reverse=True)[:settings.RAG_MAX_CONTEXT_MATCHES]
+
+    sections = {}
+    for change in code_changes:
+        similar = [match for filename, match in top if filename == change['filename']]
+        if similar and change['filename'] not in sections:
+            context_parts = [f"### Similar patterns in {change['filename']}:"]
             for match in similar:
-                context_parts.append(f"- {match['path']} (similarity: {match['score']:.2f})")
-                preview = match['content'][:200].replace('\n', ' ')
+                context_parts.append(f"- {format_location(match)} (similarity: {match['score']:.2f})")
+                preview = match['content'][:400].replace('\n', ' ')
                 context_parts.append(f"  Context: {preview}...")
-    
-    return "\n".join(context_parts) if context_parts else ""
\ No newline at end of file
+            sections[change['filename']] = "\n".join(context_parts)
+    return sections
@@ -0,0 +1,132 @@
+import json
+import re
+
+ISSUES_KEY = re.compile(r'"issues"\s*:\s*\[')
+SEVERITY_FIELD = re.compile(r'"severity"\s*:\s*"(high|medium|low)"', re.IGNORECASE)
+SUMMARY_FIELD = re.compile(r'"summary"\s*:\s*("(?:[^"\\]|\\.)*")', re.DOTALL)
+SEVERITIES = ('high', 'medium', 'low')
+# for issues the model (or an older cached review) didn't rate individually
+TYPE_SEVERITY = {'security': 'high', 'bug': 'medium', 'performance': 'medium'}
+
+class IssueStreamParser:
+    """Incrementally parse the model's JSON review while it is still streaming.
+
+    feed() returns each issue object as soon as its closing brace arrives, so
+    findings can be shown before the completion ends. result() parses the full
+    text when it is valid JSON and otherwise falls back to everything complete
+    so far (severity, summary and closed issue objects), so a truncated or
+    malformed tail no longer throws the whole response away.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.issues = []
+        self.pos = None
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.object_start = None
+        self.array_closed = False
+
+    def feed(self, text: str) -> list:
+        self.buffer += text
+        if self.pos is None:
+            match = ISSUES_KEY.search(self.buffer)
+            if not match:
+                return []
+            self.pos = match.end()
+        new_issues = []
+        buffer = self.buffer
+        while self.pos < len(buffer) and not self.array_closed:
+            ch = buffer[self.pos]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == '\\':
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch == '{':
+                if self.depth == 0:
+                    self.object_start = self.pos
+                self.depth += 1
+            elif ch == '}':
+                self.depth -= 1
+                if self.depth == 0 and self.object_start is not None:
+                    issue = load_issue(buffer[self.object_start:self.pos + 1])
+                    if issue:
+                        self.issues.append(issue)
+                        new_issues.append(issue)
+                    self.object_start = None
+            elif ch == ']' and self.depth == 0:
+                self.array_closed = True
+            self.pos += 1
+        return new_issues
+
+    def result(self) -> dict:
+        text = strip_fences(self.buffer)
+        try:
+            result = json.loads(text)
+            if isinstance(result, dict):
+                result.setdefault('severity', 'low')
+                result.setdefault('summary', 'Code review completed')
+                result['issues'] = [i for i in (load_issue(json.dumps(i)) for i in result.get('issues') or []) if i]
+                return result
+        except ValueError:
+            pass
+
+        severity = SEVERITY_FIELD.search(self.buffer)
+        summary = SUMMARY_FIELD.search(self.buffer)
+        if not (severity or summary or self.issues):
+            print(f"JSON parse error, raw AI response:\n{self.buffer[:500]}")
+            return {
+                "severity": "low",
+                "summary": "Analysis completed but response format was invalid",
+                "issues": [{
+                    "type": "error",
+                    "file": "system",
+                    "title": "Parse Error",
+                    "description": "Could not parse AI response"
+                }],
+                "invalid": True
+            }
+        print(f"   AI response was incomplete, kept {len(self.issues)} complete issue(s)")
+        return {
+            "severity": severity.group(1).lower() if severity else 'low',
+            "summary": json.loads(summary.group(1)) if summary else 'Code review completed',
+            "issues": list(self.issues),
+            "truncated": True
+        }
+
+def strip_fences(text: str) -> str:
+    if '```json' in text:
+        text = text.split('```json')[1].split('```')[0]
+    elif '```' in text:
+        text = text.split('```')[1].split('```')[0]
+    return text.strip()
+
+def issue_severity(issue: dict) -> str:
+    """The issue's own severity, or one implied by its type; never the review-wide severity."""
+    severity = str(issue.get('severity') or '').lower()
+    if severity in SEVERITIES:
+        return severity
+    return TYPE_SEVERITY.get(str(issue.get('type') or '').lower(), 'low')
+
+def issue_key(issue: dict) -> tuple:
+    """What makes two reported issues the same finding."""
+    return (issue.get('file'), issue.get('line'), issue.get('title'))
+
+def load_issue(text: str):
+    try:
+        issue = json.loads(text)
+    except ValueError:
+        return None
+    if not isinstance(issue, dict) or not (issue.get('description') or issue.get('title')):
+        return None
+    issue.setdefault('type', 'style')
+    issue.setdefault('file', 'unknown')
+    issue.setdefault('description', issue.get('title', ''))
+    issue['severity'] = issue_severity(issue)
+    return issue
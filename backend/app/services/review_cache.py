@@ -0,0 +1,94 @@
+import hashlib
+import json
+from datetime import datetime, timedelta
+
+from app.core.config import settings
+from app.core.database import session_scope
+from app.models.database import ReviewCacheEntry
+
+# per-process counters; entry-level hit counts are persisted on each row
+cache_stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+def normalize_patch(patch: str) -> str:
+    # line endings and trailing whitespace don't change what the model sees;
+    # hunk headers are kept because cached issue line numbers depend on them
+    return "\n".join(line.rstrip() for line in patch.replace('\r\n', '\n').split('\n')).strip()
+
+def make_cache_key(code_changes: list, model: str, system_prompt: str) -> str:
+    digest = hashlib.sha256()
+    digest.update(model.encode())
+    digest.update(b"\0")
+    digest.update(hashlib.sha256(system_prompt.encode()).digest())
+    for change in sorted(code_changes, key=lambda c: c['filename']):
+        digest.update(b"\0")
+        digest.update(change['filename'].encode())
+        digest.update(b"\0")
+        digest.update(normalize_patch(change['patch']).encode())
+    return digest.hexdigest()
+
+def get_cached_review(key: str):
+    if not settings.REVIEW_CACHE_ENABLED:
+        return None
+    try:
+        with session_scope() as db:
+            entry = db.query(ReviewCacheEntry).filter(ReviewCacheEntry.key == key).first()
+            expiry = datetime.utcnow() - timedelta(hours=settings.REVIEW_CACHE_TTL_HOURS)
+            if not entry or entry.created_at < expiry:
+                cache_stats["misses"] += 1
+                return None
+            entry.hits = (entry.hits or 0) + 1
+            entry.last_used_at = datetime.utcnow()
+            db.commit()
+            cache_stats["hits"] += 1
+            # hand back a copy so callers can't mutate what's stored
+            return json.loads(json.dumps(entry.result))
+    except Exception as e:
+        print(f"   Review cache lookup failed: {e}")
+        return None
+
+def store_review(key: str, model: str, result: dict):
+    if not settings.REVIEW_CACHE_ENABLED:
+        return
+    try:
+        with session_scope() as db:
+            now = datetime.utcnow()
+            entry = db.query(ReviewCacheEntry).filter(ReviewCacheEntry.key == key).first()
+            if entry:
+                entry.result = result
+                entry.created_at = now
+                entry.last_used_at = now
+            else:
+                db.add(ReviewCacheEntry(key=key, model=model, result=result, hits=0, created_at=now, last_used_at=now))
+            db.commit()
+            cache_stats["stores"] += 1
+            evict_entries(db)
+    except Exception as e:
+        print(f"   Review cache store failed: {e}")
+
+def evict_entries(db):
+    """Drop expired entries, then least recently used ones above the size cap."""
+    expiry = datetime.utcnow() - timedelta(hours=settings.REVIEW_CACHE_TTL_HOURS)
+    evicted = db.query(ReviewCacheEntry).filter(ReviewCacheEntry.created_at < expiry).delete(synchronize_session=False)
+    overflow = db.query(ReviewCacheEntry).count() - settings.REVIEW_CACHE_MAX_ENTRIES
+    if overflow > 0:
+        stale_keys = [
+            key for (key,) in db.query(ReviewCacheEntry.key)
+            .order_by(ReviewCacheEntry.last_used_at)
+            .limit(overflow)
+            .all()
+        ]
+        evicted += db.query(ReviewCacheEntry).filter(ReviewCacheEntry.key.in_(stale_keys)).delete(synchronize_session=False)
+    db.commit()
+    cache_stats["evictions"] += evicted
+
+def get_cache_stats() -> dict:
+    with session_scope() as db:
+        entries = db.query(ReviewCacheEntry).count()
+    lookups = cache_stats["hits"] + cache_stats["misses"]
+    return {
+        **cache_stats,
+        "entries": entries,
+        "hit_rate": round(cache_stats["hits"] / lookups, 3) if lookups else 0.0,
+        "ttl_hours": settings.REVIEW_CACHE_TTL_HOURS,
+        "max_entries": settings.REVIEW_CACHE_MAX_ENTRIES
+    }
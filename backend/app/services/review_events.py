@@ -0,0 +1,76 @@
+import asyncio
+import json
+import time
+
+# In-process pub/sub, one channel per review job. The queue's workers run in the
+# API process, so subscribers on the SSE endpoint see events as analyze_pr
+# publishes them. Each channel keeps its history so a late subscriber can
+# catch up, and closed channels linger briefly for clients that connect after
+# the job finishes.
+channels = {}
+CLOSED_CHANNEL_TTL_SECONDS = 300
+MAX_HISTORY = 500
+
+def get_channel(job_id: int) -> dict:
+    if job_id not in channels:
+        channels[job_id] = {"history": [], "subscribers": set(), "closed_at": None}
+    return channels[job_id]
+
+def publish(job_id: int, event: str, data: dict = None):
+    """Send an event to every subscriber of the job. Must be called on the event loop."""
+    if job_id is None:
+        return
+    channel = get_channel(job_id)
+    message = {"event": event, "data": data or {}, "ts": round(time.time(), 3)}
+    if len(channel["history"]) < MAX_HISTORY:
+        channel["history"].append(message)
+    for queue in channel["subscribers"]:
+        queue.put_nowait(message)
+
+def close_channel(job_id: int):
+    channel = channels.get(job_id)
+    if not channel:
+        return
+    channel["closed_at"] = time.monotonic()
+    for queue in channel["subscribers"]:
+        queue.put_nowait(None)
+    expire_channels()
+
+def expire_channels():
+    now = time.monotonic()
+    for job_id in [
+        job_id for job_id, channel in channels.items()
+        if channel["closed_at"] and now - channel["closed_at"] > CLOSED_CHANNEL_TTL_SECONDS
+    ]:
+        channels.pop(job_id, None)
+
+async def subscribe(job_id: int, keepalive_seconds: float = 15):
+    """Yield the job's events (history first, then live) until the channel closes.
+
+    Yields None when nothing happened for keepalive_seconds so the caller can
+    send a heartbeat.
+    """
+    channel = get_channel(job_id)
+    queue = asyncio.Queue()
+    for message in channel["history"]:
+        queue.put_nowait(message)
+    if channel["closed_at"]:
+        queue.put_nowait(None)
+    channel["subscribers"].add(queue)
+    try:
+        while True:
+            try:
+                message = await asyncio.wait_for(queue.get(), timeout=keepalive_seconds)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            if message is None:
+                return
+            yield message
+    finally:
+        channel["subscribers"].discard(queue)
+        if not channel["subscribers"] and not channel["history"]:
+            channels.pop(job_id, None)
+
+def format_sse(message: dict) -> str:
+    return f"event: {message['event']}\ndata: {json.dumps(message['data'], default=str)}\n\n"
@@ -0,0 +1,219 @@
+import re
+
+from app.core.config import settings
+from app.core.database import session_scope
+from app.models.database import Review
+from app.services.file_reviews import issue_matches_file
+from app.services.github_client import get_github_client, github_call
+
+# Marks everything this app posts so old reviews can be recognised on the PR
+REVIEW_MARKER = "<!-- codeassure-review -->"
+HUNK_HEADER = re.compile(r'^@@ -\d+(?:,\d+)? \+(\d+)(?:,\d+)? @@')
+SEVERITY_LABELS = {'high': 'HIGH', 'medium': 'MEDIUM', 'low': 'LOW'}
+COMMENTS_PER_PAGE = 100  # GraphQL connections return at most 100 nodes per page
+
+def post_review_to_github(context: dict, review: dict, previous: dict = None) -> dict:
+    """Post the review on the PR and retire the previous one; returns what was posted (or None).
+
+    In "review" mode (REVIEW_COMMENT_MODE) issues become line-anchored comments of
+    a single pull-request review and the previous review is collapsed. In
+    "issue" mode the previous summary comment is edited in place.
+    """
+    try:
+        if settings.REVIEW_COMMENT_MODE == "review":
+            posted = post_pull_request_review(context, review)
+        else:
+            posted = post_issue_comment(context, review, previous)
+        if previous and previous.get('id') != posted.get('id'):
+            retire_previous_post(context, previous)
+        print("   Successfully posted to GitHub")
+        return posted
+    except Exception as e:
+        print(f"   GitHub comment failed: {e}")
+        return None
+
+def post_issue_comment(context: dict, review: dict, previous: dict = None) -> dict:
+    pr = context['pr']
+    body = build_comment_markdown(review)
+    if previous and previous.get('mode') == "issue":
+        try:
+            github_call(
+                get_github_client().requester.requestJsonAndCheck,
+                "PATCH", f"{pr.base.repo.url}/issues/comments/{previous['id']}",
+                input={"body": body}
+            )
+            return {**previous, "head_sha": context['head_sha']}
+        except Exception as e:
+            print(f"   Could not edit previous comment, posting a new one: {e}")
+    comment = github_call(pr.create_issue_comment, body)
+    return {"mode": "issue", "id": comment.id, "node_id": comment.raw_data.get('node_id'), "head_sha": context['head_sha']}
+
+def post_pull_request_review(context: dict, review: dict) -> dict:
+    """One POST for the whole review: summary body plus every issue that maps onto a diff line."""
+    pr = context['pr']
+    inline, unplaced = build_inline_comments(review['issues'], context['code_changes'])
+    payload = {
+        "commit_id": context['head_sha'],
+        "event": "COMMENT",
+        "body": build_review_body(review, unplaced, len(inline)),
+        "comments": inline
+    }
+    requester = get_github_client().requester
+    try:
+        _, data = github_call(requester.requestJsonAndCheck, "POST", f"{pr.url}/reviews", input=payload)
+    except Exception as e:
+        if not inline:
+            raise
+        # a single unresolvable line rejects the whole review; fall back to the body only
+        print(f"   Inline comments rejected ({e}), posting summary only")
+        inline, unplaced = [], review['issues']
+        payload.update(comments=[], body=build_review_body(review, unplaced, 0))
+        _, data = github_call(requester.requestJsonAndCheck, "POST", f"{pr.url}/reviews", input=payload)
+    return {
+        "mode": "review",
+        "id": data['id'],
+        "node_id": data.get('node_id'),
+        "inline_comments": len(inline),
+        "head_sha": context['head_sha']
+    }
+
+def retire_previous_post(context: dict, previous: dict):
+    """Collapse what the previous run posted so the PR only shows the latest review expanded."""
+    requester = get_github_client().requester
+    try:
+        if previous.get('mode') == "review":
+            # reviews can't be minimized, but their comments can; shrink the body too
+            comment_ids = review_comment_ids(previous['node_id']) if previous.get('inline_comments') else []
+            # one mutation per page of comments keeps each request within GitHub's limits
+            for start in range(0, len(comment_ids), COMMENTS_PER_PAGE):
+                github_call(requester.graphql_query, *minimize_mutation(comment_ids[start:start + COMMENTS_PER_PAGE]))
+            body = f"{REVIEW_MARKER}\n_Superseded by the CodeAssure review of {context['head_sha'][:7]}._"
+            github_call(requester.graphql_query, *minimize_mutation([], previous['node_id'], body))
+        elif previous.get('node_id'):
+            github_call(requester.graphql_query, *minimize_mutation([previous['node_id']]))
+    except Exception as e:
+        print(f"   Could not collapse previous review: {e}")
+
+def review_comment_ids(review_node_id: str) -> list:
+    """Node ids of every comment on a pull-request review, following GraphQL pagination."""
+    requester = get_github_client().requester
+    query = (
+        "query($id: ID!, $after: String) { node(id: $id) { ... on PullRequestReview { "
+        f"comments(first: {COMMENTS_PER_PAGE}, after: $after) {{ nodes {{ id }} pageInfo {{ hasNextPage endCursor }} }} "
+        "} } }"
+    )
+    comment_ids, cursor = [], None
+    while True:
+        _, data = github_call(requester.graphql_query, query, {"id": review_node_id, "after": cursor})
+        comments = data['data']['node']['comments']
+        comment_ids.extend(node['id'] for node in comments['nodes'])
+        if not comments['pageInfo']['hasNextPage']:
+            return comment_ids
+        cursor = comments['pageInfo']['endCursor']
+
+def minimize_mutation(comment_ids: list, review_id: str = None, review_body: str = None) -> tuple:
+    """Build one GraphQL mutation that minimizes every comment (and rewrites the review body)."""
+    variables = {}
+    fields = []
+    for i, comment_id in enumerate(comment_ids):
+        variables[f"c{i}"] = comment_id
+        fields.append(f"c{i}: minimizeComment(input: {{subjectId: $c{i}, classifier: OUTDATED}}) {{ clientMutationId }}")
+    if review_id:
+        variables.update(review=review_id, body=review_body)
+        fields.append("review: updatePullRequestReview(input: {pullRequestReviewId: $review, body: $body}) { clientMutationId }")
+    params = ", ".join(f"${name}: {'String!' if name == 'body' else 'ID!'}" for name in variables)
+    return f"mutation({params}) {{ {' '.join(fields)} }}", variables
+
+def commentable_lines(patch: str) -> set:
+    """New-file line numbers that appear in the patch (added or context), i.e. the lines GitHub accepts comments on."""
+    lines = set()
+    line = None
+    for raw in patch.splitlines():
+        match = HUNK_HEADER.match(raw)
+        if match:
+            line = int(match.group(1))
+            continue
+        if line is None or raw.startswith('-') or raw.startswith('\\'):
+            continue
+        lines.add(line)
+        line += 1
+    return lines
+
+def build_inline_comments(issues: list, code_changes: list) -> tuple:
+    """Split issues into (review comments anchored to a diff line, issues that only fit in the body)."""
+    diff_lines = {change['filename']: commentable_lines(change['patch']) for change in code_changes}
+    inline, unplaced = [], []
+    for issue in issues:
+        try:
+            line = int(issue.get('line'))
+        except (TypeError, ValueError):
+            line = None
+        path = next((name for name in diff_lines if issue_matches_file(issue, name)), None)
+        if line is None or path is None or line not in diff_lines[path]:
+            unplaced.append(issue)
+            continue
+        inline.append({"path": path, "line": line, "side": "RIGHT", "body": build_issue_markdown(issue)})
+    return inline, unplaced
+
+def build_issue_markdown(issue: dict) -> str:
+    text = f"**[{issue['type'].upper()}] {issue.get('title', issue['type'].title())}**\n\n{issue['description']}\n"
+    if issue.get('suggestion'):
+        text += f"\n**Fix:** {issue['suggestion']}\n"
+    if issue.get('code_example'):
+        text += f"\n```{issue.get('language', '')}\n{issue['code_example']}\n```\n"
+    return text
+
+def build_review_body(review: dict, unplaced: list, inline_count: int) -> str:
+    body = f"{REVIEW_MARKER}\n## CodeAssure Review - {SEVERITY_LABELS.get(review['severity'], 'UNKNOWN')}\n\n"
+    body += f"### Summary\n{review['summary']}\n\n"
+    if inline_count:
+        body += f"{inline_count} issue(s) are commented inline.\n\n"
+    if unplaced:
+        body += f"### Other Issues ({len(unplaced)})\n\n"
+        for issue in unplaced:
+            location = f"`{issue['file']}`" + (f" (Line {issue['line']})" if issue.get('line') else "")
+            body += f"- {location}: {build_issue_markdown(issue)}\n"
+    elif not inline_count:
+        body += "### No Issues Found\n\nThe code looks good! No major issues detected.\n\n"
+    body += "_Generated by CodeAssure - AI Code Review Assistant_\n"
+    return body
+
+def build_comment_markdown(review: dict) -> str:
+    comment = f"{REVIEW_MARKER}\n## CodeAssure Review - {SEVERITY_LABELS.get(review['severity'], 'UNKNOWN')}\n\n"
+    comment += f"### Summary\n{review['summary']}\n\n"
+
+    if review['issues']:
+        comment += f"### Issues Found ({len(review['issues'])})\n\n"
+
+        for i, issue in enumerate(review['issues'], 1):
+            comment += f"#### {i}. [{issue['type'].upper()}] {issue.get('title', issue['type'].title())}\n\n"
+            comment += f"**File:** `{issue['file']}`"
+            if issue.get('line'):
+                comment += f" (Line {issue['line']})"
+            comment += "\n\n"
+
+            comment += f"**Issue:** {issue['description']}\n\n"
+
+            if issue.get('suggestion'):
+                comment += f"**Fix:** {issue['suggestion']}\n\n"
+
+            if issue.get('code_example'):
+                comment += f"```{issue.get('language', '')}\n{issue['code_example']}\n```\n\n"
+
+            comment += "---\n\n"
+    else:
+        comment += "### No Issues Found\n\n"
+        comment += "The code looks good! No major issues detected.\n\n"
+    comment += "_Generated by CodeAssure - AI Code Review Assistant_\n"
+
+    return comment
+
+def load_previous_post(repo_name: str, pr_number: int, exclude_review_id: int) -> dict:
+    with session_scope() as db:
+        review = db.query(Review).filter(
+            Review.repo_name == repo_name,
+            Review.pr_number == pr_number,
+            Review.github_post.isnot(None),
+            Review.id != exclude_review_id
+        ).order_by(Review.id.desc()).first()
+        return review.github_post if review else None
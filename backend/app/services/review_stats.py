@@ -0,0 +1,151 @@
+from datetime import datetime
+
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+
+from app.core.database import session_scope
+from app.models.database import Review, ReviewIssue
+from app.services.response_parser import issue_severity
+
+BUCKETS = ('day', 'week', 'month')
+GROUP_COLUMNS = {
+    'type': ReviewIssue.type,
+    'severity': ReviewIssue.severity,
+    'repo': ReviewIssue.repo_name,
+    'file': ReviewIssue.file
+}
+
+def issue_rows(review: Review) -> list:
+    """ReviewIssue rows for a review, built from its issues JSON."""
+    rows = []
+    for issue in review.issues or []:
+        try:
+            line = int(issue.get('line'))
+        except (TypeError, ValueError):
+            line = None
+        rows.append(ReviewIssue(
+            review_id=review.id,
+            user_id=review.user_id,
+            repo_name=review.repo_name,
+            pr_number=review.pr_number,
+            type=(issue.get('type') or 'unknown').lower(),
+            severity=issue_severity(issue),
+            file=issue.get('file'),
+            line=line,
+            title=(issue.get('title') or '')[:255] or None,
+            carried_forward=1 if issue.get('carried_forward') else 0,
+            created_at=review.created_at
+        ))
+    return rows
+
+def bucket_expression(db: Session, column, bucket: str):
+    """Truncate a timestamp to the start of its day/week/month in the database's own dialect."""
+    if db.bind.dialect.name == 'postgresql':
+        return func.date_trunc(bucket, column)
+    if bucket == 'day':
+        return func.strftime('%Y-%m-%d', column)
+    if bucket == 'week':
+        # SQLite: back up to the Monday of the week
+        return func.strftime('%Y-%m-%d', column, 'weekday 0', '-6 days')
+    return func.strftime('%Y-%m-01', column)
+
+def apply_filters(query, model, user_id=None, repo=None, since=None, until=None):
+    if user_id:
+        query = query.filter(model.user_id == user_id)
+    if repo:
+        query = query.filter(model.repo_name == repo)
+    if since:
+        query = query.filter(model.created_at >= since)
+    if until:
+        query = query.filter(model.created_at < until)
+    return query
+
+def get_issue_aggregates(
+    db: Session,
+    group_by: list,
+    bucket: str = None,
+    user_id: int = None,
+    repo: str = None,
+    issue_type: str = None,
+    severity: str = None,
+    since: datetime = None,
+    until: datetime = None,
+    include_carried: bool = False,
+    limit: int = 1000
+) -> list:
+    """Issue counts grouped by any of type/severity/repo/file, optionally per time bucket.
+
+    Findings carried forward from an earlier review of the same PR are left
+    out unless include_carried is set, so each finding counts once.
+    """
+    keys = [key for key in group_by if key in GROUP_COLUMNS]
+    columns = [GROUP_COLUMNS[key].label(key) for key in keys]
+    if bucket:
+        columns.insert(0, bucket_expression(db, ReviewIssue.created_at, bucket).label('bucket'))
+    query = db.query(*columns, func.count(ReviewIssue.id).label('count'))
+    query = apply_filters(query, ReviewIssue, user_id, repo, since, until)
+    if issue_type:
+        query = query.filter(ReviewIssue.type == issue_type)
+    if severity:
+        query = query.filter(ReviewIssue.severity == severity)
+    if not include_carried:
+        query = query.filter(ReviewIssue.carried_forward == 0)
+    if columns:
+        query = query.group_by(*columns)
+    order = [columns[0]] if bucket else []
+    rows = query.order_by(*order, func.count(ReviewIssue.id).desc()).limit(limit).all()
+    return [dict(row._mapping) for row in rows]
+
+def get_review_summary(db: Session, user_id: int = None, repo: str = None, since: datetime = None,
+                       until: datetime = None, include_carried: bool = False) -> dict:
+    """Dashboard totals from aggregate queries instead of scanning reviews in Python."""
+    reviews = apply_filters(db.query(
+        func.count(Review.id),
+        func.sum(case((Review.severity == 'high', 1), else_=0)),
+        func.sum(case((Review.issue_count == 0, 1), else_=0))
+    ), Review, user_id, repo, since, until).one()
+    issues = apply_filters(db.query(func.count(ReviewIssue.id)), ReviewIssue, user_id, repo, since, until)
+    if not include_carried:
+        issues = issues.filter(ReviewIssue.carried_forward == 0)
+    total_issues = issues.scalar()
+    by_severity = dict(apply_filters(
+        db.query(Review.severity, func.count(Review.id)), Review, user_id, repo, since, until
+    ).group_by(Review.severity).all())
+    return {
+        "total_reviews": reviews[0] or 0,
+        "high_severity_reviews": reviews[1] or 0,
+        "clean_reviews": reviews[2] or 0,
+        "total_issues": total_issues or 0,
+        "reviews_by_severity": by_severity
+    }
+
+def backfill_review_issues(batch_size: int = 1000, rebuild: bool = False) -> int:
+    """Create ReviewIssue rows (and issue_count) for reviews saved before the table existed.
+
+    With rebuild, every review's rows are recreated, e.g. to replace rows that
+    were stored with the review-wide severity instead of the issue's own.
+    """
+    created = 0
+    last_id = 0
+    while True:
+        with session_scope() as db:
+            query = db.query(Review).filter(Review.id > last_id)
+            if not rebuild:
+                query = query.filter(
+                    ~Review.id.in_(db.query(ReviewIssue.review_id).filter(ReviewIssue.review_id.isnot(None)))
+                )
+            reviews = query.order_by(Review.id).limit(batch_size).all()
+            if not reviews:
+                return created
+            if rebuild:
+                db.query(ReviewIssue).filter(
+                    ReviewIssue.review_id.in_([review.id for review in reviews])
+                ).delete(synchronize_session=False)
+            for review in reviews:
+                rows = issue_rows(review)
+                db.add_all(rows)
+                review.issue_count = len(review.issues or [])
+                created += len(rows)
+            last_id = reviews[-1].id
+            db.commit()
+            print(f"   backfilled up to review {last_id} ({created} issues)")
@@ -0,0 +1,379 @@
+import fcntl
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from app.core.config import settings
+
+EMBEDDING_DIM = 384
+ROW_BYTES = EMBEDDING_DIM * 4
+# LocalVectorStore directory -> its open lock file, held for the life of the process
+directory_locks = {}
+
+class VectorStore(ABC):
+    """What rag_service needs from a vector index: one collection per repository.
+
+    Points are plain dicts: {"id": str, "vector": list[float], "payload": dict}.
+    Search hits come back as {"id", "score", "payload"} with cosine scores.
+    """
+    name = "base"
+
+    @abstractmethod
+    def ensure_collection(self, collection: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def collection_exists(self, collection: str) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    def count(self, collection: str) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def upsert(self, collection: str, points: list):
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_paths(self, collection: str, paths):
+        raise NotImplementedError
+
+    @abstractmethod
+    def search_batch(self, collection: str, vectors: list, limit: int) -> list:
+        raise NotImplementedError
+
+    @abstractmethod
+    def file_shas(self, collection: str) -> dict:
+        """Map each indexed path to the blob SHA stored in its payload."""
+        raise NotImplementedError
+
+class QdrantVectorStore(VectorStore):
+    name = "qdrant"
+
+    def __init__(self, url: str, api_key: str):
+        from qdrant_client import QdrantClient
+        self.client = QdrantClient(url=url, api_key=api_key)
+
+    def ensure_collection(self, collection: str):
+        from qdrant_client.models import Distance, VectorParams, PayloadSchemaType
+        if self.client.collection_exists(collection):
+            print(f"   Collection already exists, updating...")
+            return
+        print(f"   Creating new collection...")
+        self.client.create_collection(
+            collection_name=collection,
+            vectors_config=VectorParams(
+                size=EMBEDDING_DIM,
+                distance=Distance.COSINE
+            )
+        )
+        self.client.create_payload_index(collection, "path", PayloadSchemaType.KEYWORD)
+
+    def collection_exists(self, collection: str) -> bool:
+        return self.client.collection_exists(collection)
+
+    def count(self, collection: str) -> int:
+        return self.client.get_collection(collection).points_count
+
+    def upsert(self, collection: str, points: list):
+        from qdrant_client.models import PointStruct
+        self.client.upsert(
+            collection_name=collection,
+            points=[PointStruct(id=p['id'], vector=p['vector'], payload=p['payload']) for p in points]
+        )
+
+    def delete_paths(self, collection: str, paths):
+        from qdrant_client.models import Filter, FieldCondition, MatchAny, FilterSelector
+        if not paths:
+            return
+        self.client.delete(
+            collection_name=collection,
+            points_selector=FilterSelector(
+                filter=Filter(must=[FieldCondition(key="path", match=MatchAny(any=list(paths)))])
+            )
+        )
+
+    def search_batch(self, collection: str, vectors: list, limit: int) -> list:
+        from qdrant_client.models import SearchRequest
+        responses = self.client.search_batch(
+            collection_name=collection,
+            requests=[SearchRequest(vector=vector, limit=limit, with_payload=True) for vector in vectors]
+        )
+        return [
+            [{"id": str(hit.id), "score": hit.score, "payload": hit.payload} for hit in hits]
+            for hits in responses
+        ]
+
+    def file_shas(self, collection: str) -> dict:
+        if not self.client.collection_exists(collection):
+            return {}
+        shas = {}
+        offset = None
+        while True:
+            records, offset = self.client.scroll(
+                collection_name=collection,
+                with_payload=["path", "sha"],
+                with_vectors=False,
+                limit=1000,
+                offset=offset
+            )
+            for record in records:
+                shas[record.payload['path']] = record.payload.get('sha')
+            if offset is None:
+                return shas
+
+class LocalVectorStore(VectorStore):
+    """In-process index: one append-only float32 file plus a JSONL record log per collection.
+
+    Vectors are stored normalized so cosine similarity is a single matrix-vector
+    product over a memory-mapped array. Updates and deletes append to the log
+    and leave dead rows behind; the files are compacted once dead rows outnumber
+    live ones. Compaction writes a new generation of both files and switches to
+    it by atomically replacing the collection's CURRENT file, and loading trims
+    whichever file a crash left ahead of the other.
+
+    Single-process only: the index is cached in memory and appended to without
+    coordination, so a second process writing the same directory would corrupt
+    it. The store takes an exclusive lock on LOCAL_VECTOR_DIR and refuses to
+    open if another process holds it; run one API worker, or use Qdrant.
+    """
+    name = "local"
+
+    def __init__(self, root: str):
+        self.root = root
+        self.collections = {}
+        self.generations = {}
+        self.lock = threading.Lock()
+        self.lock_file = self.acquire_directory_lock()
+
+    def acquire_directory_lock(self):
+        key = os.path.realpath(self.root)
+        if key in directory_locks:
+            return directory_locks[key]
+        os.makedirs(self.root, exist_ok=True)
+        lock_file = open(os.path.join(self.root, ".lock"), "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            raise RuntimeError(
+                f"Local vector index {self.root} is in use by another process; "
+                "the local store is single-process (use Qdrant for several workers)"
+            )
+        directory_locks[key] = lock_file
+        return lock_file
+
+    def generation(self, collection: str) -> int:
+        if collection not in self.generations:
+            try:
+                with open(os.path.join(self.root, collection, "CURRENT")) as f:
+                    self.generations[collection] = int(f.read().strip())
+            except (OSError, ValueError):
+                self.generations[collection] = 0
+        return self.generations[collection]
+
+    def paths_for(self, collection: str, generation: int = None) -> tuple:
+        directory = os.path.join(self.root, collection)
+        if generation is None:
+            generation = self.generation(collection)
+        suffix = f".{generation}" if generation else ""
+        return (
+            directory,
+            os.path.join(directory, f"vectors{suffix}.f32"),
+            os.path.join(directory, f"records{suffix}.jsonl")
+        )
+
+    def load(self, collection: str) -> dict:
+        if collection in self.collections:
+            return self.collections[collection]
+        directory, vector_file, record_file = self.paths_for(collection)
+        state = {"ids": [], "payloads": [], "alive": [], "index": {}, "matrix": None}
+        vector_rows = os.path.getsize(vector_file) // ROW_BYTES if os.path.exists(vector_file) else 0
+        if os.path.exists(record_file):
+            valid_bytes = 0
+            with open(record_file, "rb") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line) if line.endswith(b"\n") else None
+                    except ValueError:
+                        record = None
+                    if record is None:
+                        break
+                    if "delete" in record:
+                        row = state["index"].pop(record["delete"], None)
+                        if row is not None:
+                            state["alive"][row] = False
+                    else:
+                        if len(state["ids"]) >= vector_rows:
+                            # a record whose vector never reached the disk
+                            break
+                        previous = state["index"].get(record["id"])
+                        if previous is not None:
+                            state["alive"][previous] = False
+                        state["index"][record["id"]] = len(state["ids"])
+                        state["ids"].append(record["id"])
+                        state["payloads"].append(record["payload"])
+                        state["alive"].append(True)
+                    valid_bytes += len(line)
+            if valid_bytes < os.path.getsize(record_file):
+                print(f"   {collection}: dropping records left by an interrupted write")
+                os.truncate(record_file, valid_bytes)
+        expected = len(state["ids"]) * ROW_BYTES
+        if os.path.exists(vector_file) and os.path.getsize(vector_file) != expected:
+            # vectors are written before their records; drop rows from an interrupted write
+            os.truncate(vector_file, expected)
+        self.collections[collection] = state
+        return state
+
+    def matrix(self, collection: str, state: dict):
+        if state["matrix"] is None and state["ids"]:
+            _, vector_file, _ = self.paths_for(collection)
+            state["matrix"] = np.memmap(vector_file, dtype=np.float32, mode="r", shape=(len(state["ids"]), EMBEDDING_DIM))
+        return state["matrix"]
+
+    def ensure_collection(self, collection: str):
+        directory, _, _ = self.paths_for(collection)
+        if os.path.isdir(directory):
+            print(f"   Collection already exists, updating...")
+        else:
+            print(f"   Creating new local collection in {directory}...")
+        os.makedirs(directory, exist_ok=True)
+
+    def collection_exists(self, collection: str) -> bool:
+        return os.path.exists(self.paths_for(collection)[2])
+
+    def count(self, collection: str) -> int:
+        with self.lock:
+            return len(self.load(collection)["index"])
+
+    def upsert(self, collection: str, points: list):
+        if not points:
+            return
+        with self.lock:
+            state = self.load(collection)
+            directory, vector_file, record_file = self.paths_for(collection)
+            os.makedirs(directory, exist_ok=True)
+            vectors = np.asarray([p['vector'] for p in points], dtype=np.float32)
+            vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+            with open(vector_file, "ab") as vf, open(record_file, "a") as rf:
+                vf.write(vectors.tobytes())
+                # the vectors must be durable before any record that points at them
+                vf.flush()
+                os.fsync(vf.fileno())
+                for point in points:
+                    previous = state["index"].get(point['id'])
+                    if previous is not None:
+                        state["alive"][previous] = False
+                    state["index"][point['id']] = len(state["ids"])
+                    state["ids"].append(point['id'])
+                    state["payloads"].append(point['payload'])
+                    state["alive"].append(True)
+                    rf.write(json.dumps({"id": point['id'], "payload": point['payload']}) + "\n")
+            state["matrix"] = None
+            self.maybe_compact(collection, state)
+
+    def delete_paths(self, collection: str, paths):
+        paths = set(paths)
+        if not paths:
+            return
+        with self.lock:
+            state = self.load(collection)
+            doomed = [
+                point_id for point_id, row in state["index"].items()
+                if state["payloads"][row].get('path') in paths
+            ]
+            if not doomed:
+                return
+            with open(self.paths_for(collection)[2], "a") as rf:
+                for point_id in doomed:
+                    state["alive"][state["index"].pop(point_id)] = False
+                    rf.write(json.dumps({"delete": point_id}) + "\n")
+            self.maybe_compact(collection, state)
+
+    def search_batch(self, collection: str, vectors: list, limit: int) -> list:
+        with self.lock:
+            state = self.load(collection)
+            matrix = self.matrix(collection, state)
+            if matrix is None or not state["index"]:
+                return [[] for _ in vectors]
+            queries = np.asarray(vectors, dtype=np.float32)
+            queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+            scores = matrix @ queries.T
+            scores[~np.asarray(state["alive"]), :] = -np.inf
+            k = min(limit, len(state["index"]))
+            results = []
+            for column in scores.T:
+                top = np.argpartition(-column, k - 1)[:k]
+                top = top[np.argsort(-column[top])]
+                results.append([
+                    {"id": state["ids"][row], "score": float(column[row]), "payload": state["payloads"][row]}
+                    for row in top
+                ])
+            return results
+
+    def file_shas(self, collection: str) -> dict:
+        with self.lock:
+            state = self.load(collection)
+            return {
+                state["payloads"][row]['path']: state["payloads"][row].get('sha')
+                for row in state["index"].values()
+            }
+
+    def maybe_compact(self, collection: str, state: dict):
+        dead = len(state["ids"]) - len(state["index"])
+        if dead < 1000 or dead < len(state["index"]):
+            return
+        generation = self.generation(collection)
+        directory, old_vector_file, old_record_file = self.paths_for(collection, generation)
+        _, vector_file, record_file = self.paths_for(collection, generation + 1)
+        rows = sorted(state["index"].values())
+        vectors = np.array(self.matrix(collection, state)[rows]) if rows else np.zeros((0, EMBEDDING_DIM), np.float32)
+        state["matrix"] = None
+        with open(vector_file, "wb") as vf:
+            vf.write(vectors.tobytes())
+            vf.flush()
+            os.fsync(vf.fileno())
+        with open(record_file, "w") as rf:
+            for row in rows:
+                rf.write(json.dumps({"id": state["ids"][row], "payload": state["payloads"][row]}) + "\n")
+            rf.flush()
+            os.fsync(rf.fileno())
+        # the pair only becomes live here; a crash before this keeps the old generation
+        current = os.path.join(directory, "CURRENT")
+        with open(current + ".tmp", "w") as f:
+            f.write(str(generation + 1))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(current + ".tmp", current)
+        self.generations[collection] = generation + 1
+        for path in (old_vector_file, old_record_file):
+            if os.path.exists(path):
+                os.remove(path)
+        self.collections.pop(collection, None)
+
+vector_store = None
+vector_store_lock = threading.Lock()
+
+def get_vector_store():
+    """Qdrant when it's configured, otherwise the local index (unless VECTOR_STORE says otherwise)."""
+    global vector_store
+    if vector_store is not None:
+        return vector_store
+    # called from several pools at once; only one of them may build the store
+    with vector_store_lock:
+        if vector_store is not None:
+            return vector_store
+        backend = settings.VECTOR_STORE
+        if backend == "auto":
+            backend = "qdrant" if settings.QDRANT_URL and settings.QDRANT_API_KEY else "local"
+        if backend == "qdrant" and settings.QDRANT_URL and settings.QDRANT_API_KEY:
+            vector_store = QdrantVectorStore(settings.QDRANT_URL, settings.QDRANT_API_KEY)
+        elif backend == "local":
+            try:
+                vector_store = LocalVectorStore(settings.LOCAL_VECTOR_DIR)
+            except RuntimeError as e:
+                print(f"Vector store unavailable: {e}")
+    return vector_store
@@ -0,0 +1,83 @@
+import hashlib
+import hmac
+import json
+import time
+from collections import OrderedDict
+
+from app.core.config import settings
+
+TRACKED_PR_ACTIONS = ("opened", "synchronize")
+
+# delivery id -> when it was first seen. GitHub retries failed deliveries and
+# redeliveries reuse the id, so anything seen within the TTL is acknowledged and dropped.
+seen_deliveries = OrderedDict()
+webhook_stats = {"received": 0, "rejected": 0, "duplicates": 0, "ignored": 0, "accepted": 0, "failed": 0}
+warned_unsigned = False
+
+def verify_signature(body: bytes, signature: str) -> bool:
+    """Check X-Hub-Signature-256 (HMAC-SHA256 of the raw body). Always true when no secret is configured."""
+    global warned_unsigned
+    if not settings.GITHUB_WEBHOOK_SECRET:
+        if not warned_unsigned:
+            print("GITHUB_WEBHOOK_SECRET is not set, accepting unsigned webhooks")
+            warned_unsigned = True
+        return True
+    if not signature or not signature.startswith("sha256="):
+        return False
+    expected = hmac.new(settings.GITHUB_WEBHOOK_SECRET.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature[7:])
+
+def is_duplicate_delivery(delivery_id: str) -> bool:
+    """Record a delivery id; True if it was already seen within the TTL."""
+    if not delivery_id:
+        return False
+    now = time.monotonic()
+    cutoff = now - settings.WEBHOOK_DELIVERY_TTL_SECONDS
+    while seen_deliveries:
+        oldest_id, seen_at = next(iter(seen_deliveries.items()))
+        if seen_at >= cutoff and len(seen_deliveries) < settings.WEBHOOK_DELIVERY_CACHE_SIZE:
+            break
+        del seen_deliveries[oldest_id]
+    if delivery_id in seen_deliveries:
+        return True
+    seen_deliveries[delivery_id] = now
+    return False
+
+def forget_delivery(delivery_id: str):
+    """Let a delivery be processed again, e.g. after handling it failed."""
+    seen_deliveries.pop(delivery_id, None)
+
+def extract_event(event: str, body: bytes) -> dict:
+    """Pull the few fields a handler needs out of the payload.
+
+    Returns {"kind": "review", "pr_data": ...}, {"kind": "push", ...} or
+    {"kind": "ignored", "reason": ...}. Events we don't handle are ignored by
+    header alone, without parsing the body.
+    """
+    if event not in ("pull_request", "push"):
+        return {"kind": "ignored", "reason": f"event '{event}' not tracked"}
+    payload = json.loads(body)
+    repository = payload.get("repository") or {}
+    if event == "push":
+        default_ref = f"refs/heads/{repository.get('default_branch', 'main')}"
+        if payload.get("ref") != default_ref:
+            return {"kind": "ignored", "reason": "push not on default branch"}
+        return {"kind": "push", "repo": repository["full_name"]}
+
+    action = payload.get("action")
+    if action not in TRACKED_PR_ACTIONS:
+        return {"kind": "ignored", "reason": f"action '{action}' not tracked"}
+    pull_request = payload["pull_request"]
+    return {
+        "kind": "review",
+        "pr_data": {
+            "repo": repository["full_name"],
+            "pr_number": pull_request["number"],
+            "pr_url": pull_request["html_url"],
+            "base_sha": pull_request["base"]["sha"],
+            "head_sha": pull_request["head"]["sha"],
+        }
+    }
+
+def get_webhook_stats() -> dict:
+    return {**webhook_stats, "remembered_deliveries": len(seen_deliveries)}
@@ -0,0 +1,19 @@
+"""Populate review_issues (and reviews.issue_count) from the issues JSON of existing reviews.
+
+Safe to re-run: reviews that already have issue rows are skipped. --rebuild
+recreates the rows of every review, which fixes rows written before issues
+carried their own severity.
+
+    python -m scripts.backfill_review_issues
+    python -m scripts.backfill_review_issues --rebuild
+"""
+import argparse
+
+from app.services.review_stats import backfill_review_issues
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rebuild", action="store_true", help="recreate rows for reviews that already have them")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    print(f"Created {backfill_review_issues(args.batch_size, rebuild=args.rebuild)} issue rows")
@@ -0,0 +1,101 @@
+"""Compare embedding backends on throughput, memory and retrieval recall.
+
+Chunks the Python/JS/... files under a source directory the same way
+embed_repository does, then for each backend (in its own process, so peak RSS
+is attributable) measures chunks/sec and max RSS. Recall@k is computed against
+the torch backend: for each query chunk, how many of torch's top-k neighbours
+the backend also returns.
+
+    python -m scripts.bench_embedding_backends ../some-repo --backends torch onnx onnx-int8
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+WORKER = """
+import json, resource, sys, time
+import numpy as np
+from app.core.config import settings
+from app.services.rag_service import load_embedder
+
+backend, corpus_file, out_file = sys.argv[1:4]
+texts = json.load(open(corpus_file))
+model = load_embedder(backend)
+model.encode(texts[:8])
+start = time.perf_counter()
+vectors = model.encode(texts, batch_size=settings.EMBED_BATCH_SIZE, normalize_embeddings=True)
+elapsed = time.perf_counter() - start
+np.save(out_file, np.asarray(vectors, dtype=np.float32))
+print(json.dumps({
+    "chunks_per_sec": len(texts) / elapsed,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+}))
+"""
+
+def collect_chunks(root: str, limit: int) -> list:
+    from app.api.embeddings import should_embed_file, detect_language
+    from app.services.code_chunker import chunk_code
+    texts = []
+    for directory, _, files in os.walk(root):
+        for name in files:
+            path = os.path.join(directory, name)
+            if not should_embed_file(path):
+                continue
+            try:
+                content = open(path, encoding="utf-8").read()
+            except (UnicodeDecodeError, OSError):
+                continue
+            texts.extend(chunk["content"] for chunk in chunk_code(content, detect_language(path)))
+            if len(texts) >= limit:
+                return texts[:limit]
+    return texts
+
+def top_k(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    scores = queries @ vectors.T
+    return np.argsort(-scores, axis=1)[:, 1:k + 1]  # skip the query itself
+
+def main(args):
+    texts = collect_chunks(args.source, args.limit)
+    print(f"{len(texts)} chunks from {args.source}")
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus_file = os.path.join(tmp, "corpus.json")
+        json.dump(texts, open(corpus_file, "w"))
+        vectors, stats = {}, {}
+        for backend in args.backends:
+            out_file = os.path.join(tmp, f"{backend}.npy")
+            result = subprocess.run(
+                [sys.executable, "-c", WORKER, backend, corpus_file, out_file],
+                capture_output=True, text=True
+            )
+            if result.returncode != 0:
+                print(f"   {backend:<10} failed: {result.stderr.strip().splitlines()[-1]}")
+                continue
+            stats[backend] = json.loads(result.stdout.strip().splitlines()[-1])
+            vectors[backend] = np.load(out_file)
+
+    reference = vectors.get("torch")
+    rng = np.random.default_rng(0)
+    query_rows = rng.choice(len(texts), size=min(args.queries, len(texts)), replace=False)
+    if reference is not None:
+        expected = top_k(reference, reference[query_rows], args.k)
+    for backend, result in stats.items():
+        line = f"   {backend:<10} {result['chunks_per_sec']:8.1f} chunks/s  {result['max_rss_mb']:7.0f} MB RSS"
+        if reference is not None:
+            got = top_k(vectors[backend], vectors[backend][query_rows], args.k)
+            recall = np.mean([len(set(e) & set(g)) / args.k for e, g in zip(expected, got)])
+            line += f"  recall@{args.k} vs torch {recall:.3f}"
+        print(line)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="directory of source files to embed")
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx-int8"])
+    parser.add_argument("--limit", type=int, default=2000, help="max chunks")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    main(parser.parse_args())
@@ -0,0 +1,72 @@
+"""Measure API latency while reviews and embeddings run in the same worker.
+
+Samples /health and /api/reviews/ for a few seconds with the server idle, then
+again while manual reviews (and optionally a repository embedding) are in
+flight, and prints p50/p99 for both phases. If the event loop is blocked by
+GitHub/Groq/Qdrant/model calls the loaded p99 jumps by seconds.
+
+    REVIEW_DEBOUNCE_SECONDS=0 uvicorn app.main:app --port 8000
+    python scripts/bench_event_loop.py --repo owner/name --prs 12 13 14 15
+
+Reviews of the same PR are coalesced by the job queue, so pass distinct PRs.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+PROBES = ["/health", "/api/reviews/"]
+
+def percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+async def sample_latency(client: httpx.AsyncClient, path: str, seconds: float, interval: float) -> list:
+    samples = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        await client.get(path)
+        samples.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(interval)
+    return samples
+
+async def measure(client: httpx.AsyncClient, seconds: float, interval: float) -> dict:
+    results = await asyncio.gather(*(sample_latency(client, path, seconds, interval) for path in PROBES))
+    return dict(zip(PROBES, results))
+
+def report(label: str, results: dict):
+    print(f"\n{label}")
+    for path, samples in results.items():
+        print(
+            f"   {path:<16} n={len(samples):<5} "
+            f"p50={statistics.median(samples):7.1f}ms  p99={percentile(samples, 99):7.1f}ms  "
+            f"max={max(samples):7.1f}ms"
+        )
+
+async def main(args):
+    async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+        report("Idle", await measure(client, args.seconds, args.interval))
+
+        for pr_number in args.prs:
+            await client.post("/api/test/manual-review", params={"repo": args.repo, "pr_number": pr_number})
+        if args.embed:
+            await client.post("/api/embeddings/embed-repository", params={"repo": args.repo})
+
+        report(
+            f"Under load ({len(args.prs)} reviews{', 1 embedding job' if args.embed else ''})",
+            await measure(client, args.seconds, args.interval)
+        )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--repo", required=True)
+    parser.add_argument("--prs", type=int, nargs="+", required=True)
+    parser.add_argument("--embed", action="store_true", help="also start embedding --repo")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--interval", type=float, default=0.05)
+    asyncio.run(main(parser.parse_args()))
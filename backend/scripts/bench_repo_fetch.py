@@ -0,0 +1,63 @@
+"""Compare repository fetch strategies used for embedding.
+
+Runs the old recursive get_contents walk (one call per directory plus one per
+file) against the Git Trees listing with concurrent blob fetches and with a
+tarball download, reporting wall time and REST calls spent for each.
+
+    python -m scripts.bench_repo_fetch owner/name
+"""
+import argparse
+import time
+
+from app.api.embeddings import list_repo_files, iter_blob_files, iter_tarball_files, should_embed_file
+from app.services.github_client import get_github_client
+
+def legacy_walk(repo_name: str) -> int:
+    repo = get_github_client().get_repo(repo_name)
+    count = 0
+    contents = repo.get_contents("")
+    while contents:
+        file_content = contents.pop(0)
+        if file_content.type == "dir":
+            contents.extend(repo.get_contents(file_content.path))
+        elif should_embed_file(file_content.path):
+            try:
+                file_content.decoded_content.decode('utf-8')
+                count += 1
+            except Exception:
+                pass
+    return count
+
+def remaining_calls() -> int:
+    return get_github_client().get_rate_limit().core.remaining
+
+def run(label: str, fn):
+    before = remaining_calls()
+    start = time.perf_counter()
+    files = fn()
+    elapsed = time.perf_counter() - start
+    used = before - remaining_calls()
+    print(f"   {label:<22} {files:>6} files  {elapsed:8.1f}s  ~{used} API calls")
+    return elapsed
+
+def main(args):
+    print(f"Fetching {args.repo}")
+    timings = {}
+    if not args.skip_legacy:
+        timings['legacy'] = run("get_contents walk", lambda: legacy_walk(args.repo))
+
+    def tree_and(fetch):
+        listing = list_repo_files(args.repo)
+        return sum(1 for file in fetch(listing, list(listing['files'])) if file['content'] is not None)
+
+    timings['blobs'] = run("tree + blobs", lambda: tree_and(iter_blob_files))
+    timings['tarball'] = run("tree + tarball", lambda: tree_and(iter_tarball_files))
+    if 'legacy' in timings:
+        for key in ('blobs', 'tarball'):
+            print(f"   {key} speedup vs legacy: {timings['legacy'] / timings[key]:.1f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("repo")
+    parser.add_argument("--skip-legacy", action="store_true", help="legacy walk is slow on big repos")
+    main(parser.parse_args())
@@ -0,0 +1,121 @@
+"""Benchmark the review listing on a large reviews table.
+
+Seeds a scratch database (SQLite file by default) with N reviews carrying
+realistic issue payloads, then times the old listing query (full ORM rows,
+created_at order, OFFSET for later pages, no composite indexes) against
+list_reviews (column projection, keyset cursor, composite indexes).
+
+    python -m scripts.bench_review_listing --rows 1000000
+    python -m scripts.bench_review_listing --url postgresql://... --rows 1000000 --reuse
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, func, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.models.database import Review
+from app.api.reviews import list_reviews
+
+NEW_INDEXES = {'ix_reviews_created_id', 'ix_reviews_user_created_id', 'ix_reviews_repo_pr'}
+ISSUE = {
+    "type": "bug", "file": "src/app/service.py", "line": 42, "title": "Unchecked None return",
+    "description": "The lookup can return None and the caller dereferences it. " * 4,
+    "suggestion": "Guard the result before use or raise a clear error. " * 2
+}
+
+def seed(engine, rows: int):
+    Base.metadata.create_all(bind=engine, tables=[Review.__table__])
+    rng = random.Random(0)
+    start = datetime.utcnow() - timedelta(days=365)
+    batch = []
+    with engine.begin() as conn:
+        for i in range(rows):
+            issues = [ISSUE] * rng.randint(0, 8)
+            batch.append({
+                "user_id": rng.randint(1, 500),
+                "repo_name": f"org/repo-{rng.randint(1, 2000)}",
+                "pr_number": rng.randint(1, 5000),
+                "pr_url": "https://github.com/org/repo/pull/1",
+                "severity": rng.choice(["low", "low", "medium", "high"]),
+                "summary": "Reviewed the change set. " * 6,
+                "issues": issues,
+                "issue_count": len(issues),
+                "status": "completed",
+                "created_at": start + timedelta(seconds=i * 31536000 // rows)
+            })
+            if len(batch) == 10000:
+                conn.execute(insert(Review), batch)
+                batch = []
+                print(f"\r   seeded {i + 1}/{rows}", end="", flush=True)
+        if batch:
+            conn.execute(insert(Review), batch)
+    print()
+
+def set_new_indexes(engine, present: bool):
+    for index in Review.__table__.indexes:
+        if index.name in NEW_INDEXES:
+            if present:
+                index.create(engine, checkfirst=True)
+            else:
+                index.drop(engine, checkfirst=True)
+
+def timed(label: str, fn, repeat: int = 5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    print(f"   {label:<44} {best * 1000:9.1f} ms")
+
+def legacy(db, user_id=None, severity=None, page=0):
+    query = db.query(Review)
+    if user_id:
+        query = query.filter(Review.user_id == user_id)
+    reviews = query.order_by(Review.created_at.desc()).offset(page * 50).limit(50).all()
+    if severity:
+        reviews = [r for r in reviews if r.severity == severity]  # what the dashboard did client-side
+    return reviews
+
+def cursor_at_page(db, page: int, **filters) -> str:
+    cursor = None
+    for _ in range(page):
+        cursor = list_reviews(db, cursor=cursor, **filters)["next_cursor"]
+    return cursor
+
+def main(args):
+    engine = create_engine(args.url)
+    Session = sessionmaker(bind=engine)
+    if not args.reuse:
+        Base.metadata.drop_all(bind=engine, tables=[Review.__table__])
+        seed(engine, args.rows)
+    db = Session()
+    print(f"{db.query(func.count(Review.id)).scalar()} reviews in {args.url}")
+
+    set_new_indexes(engine, False)
+    print("before (full rows, OFFSET, no composite indexes)")
+    timed("first page", lambda: legacy(db))
+    timed("first page, one user", lambda: legacy(db, user_id=7))
+    timed(f"page {args.deep_page}", lambda: legacy(db, page=args.deep_page), repeat=2)
+    db.expunge_all()
+
+    set_new_indexes(engine, True)
+    print("after (projection, keyset cursor, composite indexes)")
+    timed("first page", lambda: list_reviews(db))
+    timed("first page, one user", lambda: list_reviews(db, user_id=7))
+    timed("first page, one user, severity=high", lambda: list_reviews(db, user_id=7, severity="high"))
+    timed("first page with issues", lambda: list_reviews(db, include_issues=True))
+    deep_cursor = cursor_at_page(db, args.deep_page)
+    timed(f"page {args.deep_page} (cursor)", lambda: list_reviews(db, cursor=deep_cursor))
+    db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="sqlite:///bench_reviews.sqlite3")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--deep-page", type=int, default=2000)
+    parser.add_argument("--reuse", action="store_true", help="keep the already seeded table")
+    main(parser.parse_args())
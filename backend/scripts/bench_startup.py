@@ -0,0 +1,48 @@
+"""Measure API import time and the cost of the first RAG call.
+
+Each measurement runs in a fresh interpreter so module caches don't hide the
+cold start:
+
+    python scripts/bench_startup.py
+
+  import app.main        time to import the app (what every worker pays on boot)
+  first encode (cold)    model load + first encode, what the first review paid
+                         before EMBEDDER_WARMUP moved it off the request path
+  next encode (warm)     steady-state cost of one query encode
+"""
+import subprocess
+import sys
+import textwrap
+
+IMPORT_APP = textwrap.dedent("""
+    import time
+    start = time.perf_counter()
+    import app.main
+    print(f"{(time.perf_counter() - start) * 1000:.0f}")
+""")
+
+FIRST_ENCODE = textwrap.dedent("""
+    import time
+    from app.services.rag_service import encode_batch
+    start = time.perf_counter()
+    encode_batch(["def handler(request):\\n    return request.json()"])
+    cold = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    encode_batch(["def other(value):\\n    return value * 2"])
+    warm = (time.perf_counter() - start) * 1000
+    print(f"{cold:.0f} {warm:.0f}")
+""")
+
+def run(code: str) -> str:
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return result.stdout.strip().splitlines()[-1]
+
+def main(runs: int = 3):
+    imports = [float(run(IMPORT_APP)) for _ in range(runs)]
+    print(f"import app.main        best {min(imports):6.0f}ms  of {runs} runs")
+    cold, warm = map(float, run(FIRST_ENCODE).split())
+    print(f"first encode (cold)    {cold:6.0f}ms")
+    print(f"next encode (warm)     {warm:6.0f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Replay GitHub webhook deliveries against the API and measure sustained events/sec.
+
+Each worker keeps POSTing a recorded payload, signed the way GitHub signs it
+(X-Hub-Signature-256 with --secret, default $GITHUB_WEBHOOK_SECRET) and with
+a fresh X-GitHub-Delivery id, for --seconds. A --duplicate-rate share of the
+requests reuse an already sent delivery id, like GitHub retries do. Prints
+throughput, status codes and latency percentiles, then the server's
+/api/webhooks/stats.
+
+Recordings are JSON files, either {"event": "pull_request", "payload": {...}}
+or a bare payload (the event is then guessed from its keys). Without any, a
+synthetic ~25 KB pull_request "synchronize" payload is used.
+
+    REVIEW_DEBOUNCE_SECONDS=60 uvicorn app.main:app --port 8000
+    python scripts/bench_webhooks.py recordings/*.json --concurrency 64 --seconds 20
+"""
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import random
+import time
+import uuid
+from collections import Counter
+
+import httpx
+
+def synthetic_payload(pr_number: int) -> dict:
+    user = {"login": "octocat", "id": 1, "type": "User", "url": "https://api.github.com/users/octocat"}
+    repository = {
+        "id": 1296269, "full_name": "octocat/Hello-World", "default_branch": "main",
+        "owner": user, "description": "x" * 2000, "topics": ["bench"] * 50
+    }
+    return {
+        "action": "synchronize",
+        "number": pr_number,
+        "pull_request": {
+            "number": pr_number,
+            "html_url": f"https://github.com/octocat/Hello-World/pull/{pr_number}",
+            "title": "Benchmark pull request",
+            "body": "Lorem ipsum dolor sit amet. " * 500,
+            "user": user,
+            "base": {"sha": "a" * 40, "ref": "main", "repo": repository},
+            "head": {"sha": uuid.uuid4().hex + "00000000", "ref": "feature", "repo": repository}
+        },
+        "repository": repository,
+        "sender": user
+    }
+
+def load_recordings(paths: list) -> list:
+    recordings = []
+    for path in paths:
+        with open(path, "rb") as f:
+            data = json.load(f)
+        if "payload" in data and "event" in data:
+            event, payload = data["event"], data["payload"]
+        else:
+            event, payload = ("push" if "commits" in data else "pull_request"), data
+        recordings.append((event, json.dumps(payload).encode()))
+    return recordings
+
+def sign(body: bytes, secret: str) -> str:
+    return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+def percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+async def worker(client, recordings, args, deadline, sent_ids, latencies, statuses, rng):
+    while time.perf_counter() < deadline:
+        event, body = rng.choice(recordings)
+        if sent_ids and rng.random() < args.duplicate_rate:
+            delivery_id = rng.choice(sent_ids)
+        else:
+            delivery_id = str(uuid.uuid4())
+            sent_ids.append(delivery_id)
+        headers = {
+            "Content-Type": "application/json",
+            "X-GitHub-Event": event,
+            "X-GitHub-Delivery": delivery_id
+        }
+        if args.secret:
+            headers["X-Hub-Signature-256"] = sign(body, args.secret)
+        started = time.perf_counter()
+        try:
+            response = await client.post("/api/webhooks/github", content=body, headers=headers)
+            statuses[response.status_code] += 1
+        except httpx.HTTPError as e:
+            statuses[type(e).__name__] += 1
+        latencies.append(time.perf_counter() - started)
+
+async def main(args):
+    recordings = load_recordings(args.recordings) if args.recordings else [
+        ("pull_request", json.dumps(synthetic_payload(number)).encode()) for number in range(1, args.prs + 1)
+    ]
+    print(f"{len(recordings)} payload(s), avg {sum(len(body) for _, body in recordings) // len(recordings)} bytes, "
+          f"concurrency {args.concurrency}, {args.seconds}s, signed={bool(args.secret)}")
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=30) as client:
+        latencies, statuses, sent_ids = [], Counter(), []
+        rng = random.Random(0)
+        started = time.perf_counter()
+        deadline = started + args.seconds
+        await asyncio.gather(*[
+            worker(client, recordings, args, deadline, sent_ids, latencies, statuses, rng)
+            for _ in range(args.concurrency)
+        ])
+        elapsed = time.perf_counter() - started
+
+        print(f"   {len(latencies)} requests, {len(latencies) / elapsed:.0f} events/sec")
+        print(f"   statuses {dict(statuses)}")
+        if latencies:
+            print(f"   latency p50 {percentile(latencies, 50) * 1000:.1f} ms, "
+                  f"p95 {percentile(latencies, 95) * 1000:.1f} ms, p99 {percentile(latencies, 99) * 1000:.1f} ms")
+        stats = await client.get("/api/webhooks/stats")
+        print(f"   server {stats.json()}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("recordings", nargs="*", help="recorded delivery payloads (.json)")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--secret", default=os.environ.get("GITHUB_WEBHOOK_SECRET"))
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--duplicate-rate", type=float, default=0.05, help="share of requests that resend a delivery id")
+    parser.add_argument("--prs", type=int, default=20, help="distinct PRs in the synthetic payloads")
+    asyncio.run(main(parser.parse_args()))
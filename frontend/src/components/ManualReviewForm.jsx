@@ -1,12 +1,13 @@
 import React, { useState } from 'react'
 import { Play, Loader2 } from 'lucide-react'
-import { triggerManualReview } from '../lib/api'
+import { triggerManualReview, subscribeToJob } from '../lib/api'
 
 function ManualReviewForm({ onSuccess }) {
   const [repo, setRepo] = useState('')
   const [prNumber, setPrNumber] = useState('')
   const [loading, setLoading] = useState(false)
   const [error, setError] = useState('')
+  const [progress, setProgress] = useState(null)
 
   const handleSubmit = async (e) => {
     e.preventDefault()
@@ -14,13 +15,33 @@ function ManualReviewForm({ onSuccess }) {
     setLoading(true)
     try {
       const result = await triggerManualReview(repo, parseInt(prNumber))
-      alert(`Review started for ${repo}#${prNumber}\n\nCheck back in a few seconds!`)
+      setProgress({ label: `${repo}#${prNumber}`, stage: 'queued', issues: [] })
       setRepo('')
       setPrNumber('')
-      
-      if (onSuccess) {
-        setTimeout(onSuccess, 3000)
-      }
+
+      subscribeToJob(result.job_id, {
+        onStage: ({ stage }) => setProgress((p) => p && { ...p, stage }),
+        onIssue: (issue) => setProgress((p) => p && { ...p, issues: [...p.issues, issue] }),
+        onReview: () => {
+          setProgress((p) => p && { ...p, stage: 'done' })
+          if (onSuccess) onSuccess()
+        },
+        onDone: (job) => {
+          if (!job) {
+            // stream dropped without a final status
+            setProgress((p) => p && (p.stage === 'done' ? p : { ...p, stage: 'connection lost', failed: true }))
+          } else if (job.status === 'failed') {
+            setProgress((p) => p && { ...p, stage: 'failed', failed: true })
+            setError(job.error || 'Review failed')
+          } else if (job.status === 'superseded') {
+            setProgress((p) => p && { ...p, stage: 'superseded by a newer commit' })
+          } else if (job.status === 'cancelled') {
+            setProgress((p) => p && { ...p, stage: 'cancelled' })
+          } else {
+            setProgress((p) => p && { ...p, stage: 'done' })
+          }
+        },
+      })
     } catch (err) {
       setError(err.response?.data?.detail || 'Failed to start review')
     } finally {
@@ -66,6 +87,21 @@ function ManualReviewForm({ onSuccess }) {
           />
         </div>
 
+        {progress && (
+          <div className={`${progress.failed ? 'bg-red-50 dark:bg-red-900 border-red-200 dark:border-red-800 text-red-800 dark:text-red-100' : 'bg-indigo-50 dark:bg-indigo-900 border-indigo-200 dark:border-indigo-800 text-indigo-800 dark:text-indigo-100'} border px-4 py-3 rounded text-sm`}>
+            <p className="font-medium">
+              {progress.label}: {progress.stage} ({progress.issues.length} finding{progress.issues.length === 1 ? '' : 's'}{progress.stage === 'done' ? '' : ' so far'})
+            </p>
+            <ul className="mt-2 space-y-1">
+              {progress.issues.slice(-5).map((issue, i) => (
+                <li key={i} className="truncate">
+                  [{issue.type}] {issue.title || issue.description} <span className="opacity-70">{issue.file}</span>
+                </li>
+              ))}
+            </ul>
+          </div>
+        )}
+
         {error && (
           <div className="bg-red-50 dark:bg-red-900 border border-red-200 dark:border-red-800 text-red-700 dark:text-red-200 px-4 py-3 rounded">
             {error}
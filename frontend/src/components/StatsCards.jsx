@@ -1,11 +1,20 @@
 import React from 'react'
+import { useQuery } from '@tanstack/react-query'
 import { FileText, AlertTriangle, CheckCircle, TrendingUp } from 'lucide-react'
+import { fetchReviewStats } from '../lib/api'
 
 function StatsCards({ reviews }) {
-  const totalReviews = reviews?.length || 0
-  const highSeverity = reviews?.filter(r => r.severity === 'high').length || 0
-  const noIssues = reviews?.filter(r => !r.issues || r.issues.length === 0).length || 0
-  const totalIssues = reviews?.reduce((sum, r) => sum + (r.issues?.length || 0), 0) || 0
+  // totals over the whole history come from the server; the loaded page is only a fallback
+  const { data: summary } = useQuery({
+    queryKey: ['review-stats'],
+    queryFn: fetchReviewStats,
+    refetchInterval: 30000,
+    retry: false
+  })
+  const totalReviews = summary?.total_reviews ?? (reviews?.length || 0)
+  const highSeverity = summary?.high_severity_reviews ?? (reviews?.filter(r => r.severity === 'high').length || 0)
+  const noIssues = summary?.clean_reviews ?? (reviews?.filter(r => !r.issues || r.issues.length === 0).length || 0)
+  const totalIssues = summary?.total_issues ?? (reviews?.reduce((sum, r) => sum + (r.issues?.length || 0), 0) || 0)
 
   const stats = [
     {
@@ -8,17 +8,21 @@ const api = axios.create({
 api.interceptors.request.use((config) => {
   const token = localStorage.getItem('auth_token')
   if (token) {
-    config.params = {
-      ...config.params,
-      token: token
-    }
+    config.headers.Authorization = `Bearer ${token}`
   }
   return config
 })
 
+// One page of the review listing. params: severity, repo, since, until,
+// cursor (next_cursor of the previous page), limit, include_issues.
+export const fetchReviewPage = async (params = {}) => {
+  const { data } = await api.get('/api/reviews/', { params })
+  return data
+}
+
 export const fetchReviews = async () => {
   try {
-    const { data } = await api.get('/api/reviews/')
+    const { data } = await api.get('/api/reviews/', { params: { include_issues: true } })
     return data.reviews || []
   } catch (error) {
     console.error('Fetch reviews error:', error)
@@ -26,6 +30,17 @@ export const fetchReviews = async () => {
   }
 }
 
+export const fetchReviewStats = async () => {
+  const { data } = await api.get('/api/reviews/stats/summary')
+  return data
+}
+
+// Issue counts grouped server-side, e.g. { group_by: 'repo', type: 'security', bucket: 'month' }
+export const fetchIssueStats = async (params = {}) => {
+  const { data } = await api.get('/api/reviews/stats/issues', { params })
+  return data.rows
+}
+
 export const fetchReview = async (id) => {
   const { data } = await api.get(`/api/reviews/${id}`)
   return data
@@ -38,6 +53,28 @@ export const triggerManualReview = async (repo, prNumber) => {
   return data
 }
 
+// Live progress for a queued review: stage changes, each issue as the model
+// produces it, then the saved review. Returns a function that closes the stream.
+export const subscribeToJob = (jobId, { onStage, onIssue, onReview, onDone } = {}) => {
+  const source = new EventSource(`${API_URL}/api/reviews/jobs/${jobId}/events`)
+  const parse = (handler) => (event) => handler && handler(JSON.parse(event.data))
+  source.addEventListener('stage', parse(onStage))
+  source.addEventListener('issue', parse(onIssue))
+  source.addEventListener('review', parse(onReview))
+  source.addEventListener('job', (event) => {
+    const job = JSON.parse(event.data)
+    if (['completed', 'failed', 'superseded', 'cancelled'].includes(job.status)) {
+      source.close()
+      if (onDone) onDone(job)
+    }
+  })
+  source.onerror = () => {
+    // the server ends the stream once the job is finished
+    if (source.readyState === EventSource.CLOSED && onDone) onDone(null)
+  }
+  return () => source.close()
+}
+
 export const checkHealth = async () => {
   const { data } = await api.get('/api/test/health')
   return data
@@ -54,4 +91,14 @@ export const getCurrentUser = async () => {
     throw error
   }
 }
+// Revokes the token server-side; the local copy is dropped even if that fails.
+export const logout = async () => {
+  try {
+    await api.post('/api/auth/logout')
+  } catch (error) {
+    console.error('Logout error:', error)
+  } finally {
+    localStorage.removeItem('auth_token')
+  }
+}
 export default api
\ No newline at end of file
@@ -1,7 +1,7 @@
 import React, { useState } from 'react'
 import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query'
 import { useNavigate } from 'react-router-dom'
-import { getCurrentUser } from '../lib/api'
+import { getCurrentUser, logout } from '../lib/api'
 import Header from '../components/Header'
 import { Database, CheckCircle, Clock, AlertCircle, Play, Loader2 } from 'lucide-react'
 import axios from 'axios'
@@ -22,11 +22,10 @@ function Repositories() {
 
   const embedMutation = useMutation({
     mutationFn: async (repo) => {
-      const token = localStorage.getItem('auth_token')
       const { data } = await axios.post(
         `${API_URL}/api/embeddings/embed-repository`,
         null,
-        { params: { repo, token } }
+        { params: { repo } }
       )
       return data
     },
@@ -38,10 +37,9 @@ function Repositories() {
 
   const checkEmbeddingStatus = async (repo) => {
     try {
-      const token = localStorage.getItem('auth_token')
       const { data } = await axios.get(
         `${API_URL}/api/embeddings/embedding-status`,
-        { params: { repo, token } }
+        { params: { repo } }
       )
       setEmbeddedRepos(prev => 
         prev.map(r => 
@@ -76,8 +74,8 @@ function Repositories() {
 
   return (
     <div className="min-h-screen bg-gradient-to-br from-gray-50 to-gray-100 dark:from-gray-900 dark:to-gray-800 transition-colors">
-      <Header user={user} onLogout={() => {
-        localStorage.removeItem('auth_token')
+      <Header user={user} onLogout={async () => {
+        await logout()
         navigate('/login')
       }} />
       <main className="container mx-auto px-6 py-8 max-w-4xl">
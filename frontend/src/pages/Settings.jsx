@@ -1,7 +1,7 @@
 import React, { useState } from 'react'
 import { useQuery } from '@tanstack/react-query'
 import { useNavigate } from 'react-router-dom'
-import { getCurrentUser } from '../lib/api'
+import { getCurrentUser, logout } from '../lib/api'
 import { useTheme } from '../contexts/ThemeContext'
 import Header from '../components/Header'
 import LogoutWarning from '../components/LogoutWarning'
@@ -19,8 +19,8 @@ function Settings() {
   const handleLogoutClick = () => {
     setShowLogoutWarning(true)
   }
-  const handleLogoutConfirm = () => {
-    localStorage.removeItem('auth_token')
+  const handleLogoutConfirm = async () => {
+    await logout()
     setShowLogoutWarning(false)
     navigate('/login')
   }